@@ -0,0 +1,59 @@
+"""
+Startup time of the Elections modules in fresh interpreters, the
+cost every worker process pays before its first scenario.
+
+    python Elections/bench_startup.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+STATEMENTS = {
+    'analysis (coalitions)': 'import coalitions',
+    'plotting': 'import plotting',
+}
+
+# importing the analysis must not drag the plotting libraries in
+HEADLESS_CHECK = ("import sys, coalitions; "
+                  "assert 'matplotlib' not in sys.modules, 'matplotlib'; "
+                  "assert 'seaborn' not in sys.modules, 'seaborn'")
+
+
+def time_import(statement, runs):
+    """
+    Wall time of running the statement in a new interpreter, the
+    interpreter startup itself is measured apart and subtracted
+    """
+    def run(code):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=HERE, check=True)
+        return time.perf_counter() - started
+
+    baseline = statistics.median(run('pass') for _ in range(runs))
+    timings = [run(statement) - baseline for _ in range(runs)]
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the import time of the Elections modules.")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, '-c', HEADLESS_CHECK],
+                   cwd=HERE,
+                   check=True)
+    print("coalitions imports without matplotlib/seaborn")
+    for name, statement in STATEMENTS.items():
+        median, best = time_import(statement, args.runs)
+        print(f"{name}: median {median * 1000:.0f} ms, " +
+              f"best {best * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,62 @@
 import numpy as np
 import pandas as pd
-import itertools as it
-from collections import Counter, OrderedDict
-import seaborn as sns
-import matplotlib.pyplot as plt
+import math
+import time
+import csv
+import os
+import io
+import glob
+import argparse
+import contextlib
+import multiprocessing
+import hashlib
+import json
+import tempfile
 
+# results of the exact methods are kept here, '' disables the cache
+CACHE_DIR = os.environ.get(
+    'COALITIONS_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+CACHE_MAX_BYTES = 64 * 2**20
 
-def compute_coalitions(filepath):
+
+def compute_coalitions(filepath,
+                       method='subsets',
+                       weighting='legacy',
+                       coalitions='all',
+                       axis=None,
+                       **sampling):
     """
     Reads the csv for elections and
     computes the coalitions
+    :param method
+        'subsets' enumerates all coalitions (and writes them to
+        coalition_output.csv), 'dp' counts them with dp_swing_counts,
+        'monte_carlo' estimates the values with monte_carlo_shapley;
+        values already in the cache are reused, only the listing of
+        all coalitions is enumerated again
+    :param weighting
+        see coalition_weights
+    :param coalitions, axis
+        which winning coalitions are written, see shapley_value;
+        the axis may name the parties either by Party or by Group
+    :param sampling
+        tolerance, time_budget, seed, ... of monte_carlo_shapley
+    """
+    df, party_dict = read_parties(filepath)
+    group_columns = [column for column in df if column.startswith('Group')]
+    if axis is not None and group_columns:
+        party_of_group = dict(zip(df[group_columns[0]], df['Party']))
+        axis = [party_of_group.get(name, name) for name in axis]
+    shapley_value(party_dict, df, filepath, weighting, method, coalitions,
+                  axis, **sampling)
+
+
+def read_parties(filepath):
+    """
+    Reads the csv for elections
+    :returns
+        (dataframe, dictionary of parties that have seats)
     """
     df = pd.read_csv(filepath, sep=';')
     party_records = df[['Party', 'Seats']].to_records()
@@ -17,102 +64,646 @@ def compute_coalitions(filepath):
     for indx, party, seats in party_records:
         if seats:
             party_dict[party] = seats
-    shapley_value(party_dict, df, filepath)
+    return df, party_dict
 
 
-def shapley_value(party_dict: dict, org_df=None, filepath=None):
+def shapley_value(party_dict: dict, org_df=None, filepath=None,
+                  weighting='legacy', method='subsets', coalitions='all',
+                  axis=None, **sampling):
     """
     Calculates the player contributions aka Shapley
     values.
     :param party_dict
         dictionary of parties and ther seits
+    :param weighting
+        how the swings of every coalition size are weighted,
+        see coalition_weights
+    :param method
+        'subsets' - subset_swing_counts, also lists the winning
+            coalitions
+        'dp' - dp_swing_counts, pseudo-polynomial in the seats,
+            coalition_output.csv is not written
+        'monte_carlo' - monte_carlo_shapley, the standard errors and
+            95% confidence bounds are written next to the values
+    :param coalitions
+        'all' - every winning coalition, only listed by the
+            'subsets' method
+        'minimal' - minimal_winning_coalitions
+        'connected' - connected_winning_coalitions along the axis
+        None - coalition_output.csv is not written
+    :param axis
+        parties ordered from left to right, for 'connected'
+    :param sampling
+        keyword arguments of monte_carlo_shapley
     :returns (produces)
-        dictionary of player combinations and 
-        values for each combination aka 
-        each coalition and value 
-        d = {(P1, P2, P3): 2, (P1): 1, ....}
+        the winning coalitions in coalition_output.csv and
+        the Shapley column of {filepath}_shapley_modified.csv
     """
     all_parties = list(party_dict.keys())
-    total_seats = sum(party_dict.values())
-    coalition_dict = {}
+    seats = [party_dict[party] for party in all_parties]
+    total_seats = sum(seats)
     winning_seats = 0.5 * total_seats + 1
     print(f"Calculating Shapley value, winning seats: {winning_seats}")
-    combinations = 0
-    for group_length in range(1, len(all_parties) + 1):
-        print(f"Calculating the groups of lengths {group_length}")
-        for permutation in it.permutations(all_parties, r=group_length):
-            coalition_value = calcualte_permutation_value(
-                party_dict, permutation, winning_seats)
-            coalition_dict[permutation] = coalition_value
-            combinations += 1
-    print(f"Possible combinations: {combinations}")
-    player_inputs = Counter()
+    values, std_errors, winning_masks, winning_totals = solve_game(
+        seats, winning_seats, method, weighting,
+        listing=coalitions == 'all', **sampling)
     print("Calculating player's inputs")
-    for coalition in coalition_dict:
-        # print(f"Value for coalition: {coalition}, {coalition_dict[coalition]}")
-        current_coalition_value = coalition_dict[coalition]
-        """
-        Add contribution for each player in the reduced coalition
-        eg.
-        P1, P2, P3 = 5
-        P1 = 3
-        add P1 += 3 
-        P1, P2 = 4 
-        add P2 += (4 - 3)
-        P1, P3, P3
-        add P3 += (5 - 4)
-        """
-        for i in reversed(range(len(coalition))):
-            if i == 0:
-                # just a single player in the coalition, so just add him
-                player_inputs[coalition[i]] += coalition_dict[(coalition[i], )]
-                break
-            # we take player i reduced coalition
-            reduced_coalition = coalition[:
-                                          i]  # if i == 1, then is a single player
-            reduced_coalition_value = coalition_dict[reduced_coalition]
-            player_inputs[coalition[i]] += (current_coalition_value -
-                                            reduced_coalition_value)
-            current_coalition_value = reduced_coalition_value
-    # get all winning_coalitions
+    player_inputs = dict(zip(all_parties, values))
     print(player_inputs)
-    winning_coals = [coal for coal, val in coalition_dict.items() if val]
-    winning_coals = [
-        tuple(coal) for coal in set(map(frozenset, winning_coals))
-    ]
-
-    # count player coalitions
-    player_coalitions = Counter()
-    for coalition in coalition_dict:
-        for player in player_inputs:
-            if player in coalition:
-                player_coalitions[player] += 1
-
-    print(f"There are: {len(winning_coals)} winning coalitions")
-    data = {'Coalition': [], 'Seats': []}
-    for coal in winning_coals:
-        coalition_seats = sum([party_dict[party] for party in coal])
-        coal_name = ', '.join(coal)
-        data['Coalition'].append(coal_name)
-        data['Seats'].append(coalition_seats)
-        print(
-            f"\tCoalition: {coal_name} has " +\
-                f"{coalition_seats} seats.")
+    if coalitions == 'all' and winning_masks is not None:
+        # get all winning_coalitions
+        members = coalition_members(winning_masks, len(all_parties))
+        names = np.array(all_parties, dtype=object)
+        data = {
+            'Coalition': [', '.join(names[row]) for row in members],
+            'Seats': winning_totals
+        }
+        print(f"There are: {len(winning_masks)} winning coalitions")
+        df = pd.DataFrame.from_dict(data=data)
+        print(df)
+        df.to_csv('coalition_output.csv', index=False)
+    elif coalitions in ('minimal', 'connected'):
+        if coalitions == 'minimal':
+            found = minimal_winning_coalitions(party_dict, winning_seats)
+        else:
+            found = connected_winning_coalitions(party_dict, winning_seats,
+                                                 axis)
+        written = write_coalitions(found, 'coalition_output.csv')
+        print(f"There are: {written} {coalitions} winning coalitions")
+    elif coalitions not in ('all', None):
+        raise ValueError(f"Unknown coalitions: {coalitions}")
 
     org_df['Shapley'] = 0.0
     for player in player_inputs:
-        shapley_value = player_inputs[player] / player_coalitions[player]
+        shapley_value = player_inputs[player]
         print(
             f"Player {player}: " + \
                 f"coalition input {shapley_value}"
         )
         org_df.loc[org_df['Party'] == player, 'Shapley'] = shapley_value
-    df = pd.DataFrame.from_dict(data=data)
-    df.to_csv('coalition_output.csv', index=False)
+    if std_errors is not None:
+        org_df['Shapley_std_error'] = 0.0
+        for player, std_error in zip(all_parties, std_errors):
+            org_df.loc[org_df['Party'] == player,
+                       'Shapley_std_error'] = std_error
+        org_df['Shapley_ci_low'] = org_df['Shapley'] - \
+            1.96 * org_df['Shapley_std_error']
+        org_df['Shapley_ci_high'] = org_df['Shapley'] + \
+            1.96 * org_df['Shapley_std_error']
     savename = filepath.replace('.csv', '')
     org_df.to_csv(f'{savename}_shapley_modified.csv', index=False)
 
 
+def solve_game(seats,
+               winning_seats,
+               method='subsets',
+               weighting='legacy',
+               cache=True,
+               listing=False,
+               **sampling):
+    """
+    Computes the power index of every party with the given method,
+    see shapley_value. The exact methods store their values in the
+    cache and every method answers from it when it can ('monte_carlo'
+    with zero standard errors), 'subsets' only when no listing is asked.
+    :param listing
+        whether the winning coalitions are needed, so 'subsets' has to
+        enumerate them
+    :returns
+        (values, std_errors, winning_masks, winning_totals), the
+        standard errors only for 'monte_carlo' and the winning
+        coalitions only for 'subsets' when enumerated, None otherwise
+    """
+    if method not in ('subsets', 'dp', 'monte_carlo'):
+        raise ValueError(f"Unknown method: {method}")
+    std_errors, winning_masks, winning_totals = None, None, None
+    values = None
+    if cache and not (listing and method == 'subsets'):
+        values = cached_indices(seats, winning_seats, weighting)
+    if values is not None:
+        if method == 'monte_carlo':
+            # the exact values, nothing left to sample
+            std_errors = [0.0] * len(values)
+        return values, std_errors, winning_masks, winning_totals
+    if method == 'subsets':
+        swings, winning_masks, winning_totals = subset_swing_counts(
+            seats, winning_seats)
+        print(f"Possible combinations: {1 << len(seats)}")
+    elif method == 'dp':
+        swings = dp_swing_counts(seats, winning_seats)
+    else:
+        values, std_errors, samples = monte_carlo_shapley(
+            seats, winning_seats, weighting, **sampling)
+        print(f"Sampled orderings: {samples}, " +
+              f"largest standard error: {np.max(std_errors)}")
+        return values, std_errors, winning_masks, winning_totals
+    values = indices_from_swings(swings, weighting)
+    if cache:
+        store_indices(seats, winning_seats, weighting, values)
+    return values, std_errors, winning_masks, winning_totals
+
+
+def cache_entry(seats, winning_seats, weighting, cache_dir=None):
+    """
+    Content address of a game: the same seats in any party order,
+    under the same quota and index, share one file
+    :returns
+        (path or None when caching is off, canonical key, order of the
+        parties in the canonical key)
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    order = sorted(range(len(seats)), key=lambda i: -seats[i])
+    key = {
+        'seats': [int(seats[i]) for i in order],
+        'quota': 'more than winning_seats',
+        'winning_seats': float(winning_seats),
+        'index': weighting
+    }
+    if not cache_dir:
+        return None, key, order
+    digest = hashlib.sha256(
+        json.dumps(key, sort_keys=True).encode()).hexdigest()
+    return os.path.join(cache_dir, f'{digest}.json'), key, order
+
+
+def cached_indices(seats, winning_seats, weighting, cache_dir=None):
+    """
+    Looks the game up in the on-disk cache
+    :returns
+        values in the order of seats, None on a miss
+    """
+    path, key, order = cache_entry(seats, winning_seats, weighting,
+                                   cache_dir)
+    if path is None:
+        return None
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        # mark as recently used for the eviction
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    if entry['key'] != key:
+        return None
+    values = [0.0] * len(seats)
+    for position, i in enumerate(order):
+        values[i] = entry['values'][position]
+    return values
+
+
+def store_indices(seats,
+                  winning_seats,
+                  weighting,
+                  values,
+                  cache_dir=None,
+                  max_bytes=None):
+    """
+    Writes the values to the on-disk cache and evicts the least
+    recently used entries once it grows over max_bytes
+    """
+    path, key, order = cache_entry(seats, winning_seats, weighting,
+                                   cache_dir)
+    if path is None:
+        return
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = {'key': key, 'values': [float(values[i]) for i in order]}
+    # written aside and renamed so that parallel workers never
+    # read a half written entry
+    handle, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+    entries = []
+    for filename in os.listdir(cache_dir):
+        if filename.endswith('.json'):
+            try:
+                stat = os.stat(os.path.join(cache_dir, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+    used = sum(size for _, size, _ in entries)
+    for _, size, filename in sorted(entries):
+        if used <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, filename))
+        except OSError:
+            pass
+        used -= size
+
+
+def shapley_frame(filepath, weighting='legacy'):
+    """
+    The *_shapley_modified.csv table of an elections csv, with the
+    values taken from the cache (and computed on a miss) instead of
+    a previous compute_coalitions run
+    """
+    df, party_dict = read_parties(filepath)
+    seats = list(party_dict.values())
+    with contextlib.redirect_stdout(io.StringIO()):
+        values, _, _, _ = solve_game(seats, 0.5 * sum(seats) + 1, 'dp',
+                                     weighting)
+    df['Shapley'] = 0.0
+    for party, value in zip(party_dict, values):
+        df.loc[df['Party'] == party, 'Shapley'] = value
+    return df
+
+
+def subset_swing_counts(seats, winning_seats):
+    """
+    Walks the 2^n unordered coalitions as bitmasks (bit i set
+    means party i is a member) and counts the swings of every party.
+    Everything is kept in arrays indexed by the bitmask, so no
+    coalition is visited from Python.
+    :param seats
+        list of seats of each party
+    :param winning_seats
+        number of seats that ensures the win
+    :returns
+        (swings, winning_masks, winning_totals) where swings[i][s] is
+        the number of losing coalitions of size s without party i that
+        become winning once party i joins, winning_masks are the
+        bitmasks of all winning coalitions and winning_totals
+        their seats
+    """
+    n = len(seats)
+    coalition_seats = np.zeros(1 << n, dtype=np.int64)
+    coalition_size = np.zeros(1 << n, dtype=np.int8)
+    for i, weight in enumerate(seats):
+        # the coalitions with party i are the ones before it plus i
+        coalition_seats[1 << i:2 << i] = coalition_seats[:1 << i] + weight
+        coalition_size[1 << i:2 << i] = coalition_size[:1 << i] + 1
+    winning = coalition_seats > winning_seats
+
+    swings = []
+    for i in range(n):
+        # split the masks on bit i: [:, 0] lacks party i, [:, 1] has it
+        by_member = winning.reshape(-1, 2, 1 << i)
+        swing = ~by_member[:, 0] & by_member[:, 1]
+        sizes = coalition_size.reshape(-1, 2, 1 << i)[:, 0][swing]
+        swings.append(np.bincount(sizes, minlength=n)[:n].tolist())
+    winning_masks = np.flatnonzero(winning)
+    return swings, winning_masks, coalition_seats[winning_masks]
+
+
+def coalition_members(winning_masks, n):
+    """
+    Boolean (coalitions x parties) membership table of the
+    given bitmasks
+    """
+    return (np.asarray(winning_masks)[:, None] >> np.arange(n)) & 1 == 1
+
+
+def dp_swing_counts(seats, winning_seats):
+    """
+    Counts the same swings as subset_swing_counts without
+    enumerating the coalitions. The game is a weighted majority game,
+    so it is enough to know how many coalitions there are of every
+    size and seat total: counts[s][w] is built like a knapsack, one
+    party at a time, and the coalitions without party i are recovered
+    by taking party i back out of it, which is O(n^2 * seats) overall.
+    Only seat totals that are still losing are kept, see
+    coalition_counts and counts_without.
+    :param seats
+        list of (integer) seats of each party
+    :param winning_seats
+        number of seats that ensures the win
+    :returns
+        swings[i][s] as in subset_swing_counts
+    """
+    n = len(seats)
+    max_losing = math.floor(winning_seats)
+    if max_losing < 0:
+        return [[0] * n for _ in range(n)]
+    counts = coalition_counts(seats, max_losing)
+
+    swings = []
+    without_weight = {}
+    for weight in seats:
+        if weight not in without_weight:
+            without = counts_without(counts, weight)
+            first_swing = max(math.floor(winning_seats - weight) + 1, 0)
+            without_weight[weight] = [
+                int(without[size, first_swing:].sum()) for size in range(n)
+            ]
+        swings.append(list(without_weight[weight]))
+    return swings
+
+
+def coalition_counts(seats, max_seats):
+    """
+    Knapsack table of the coalitions: counts[s][w] is the number of
+    coalitions of s parties holding w seats, for w up to max_seats
+    (parties bigger than that are left out)
+    """
+    n = len(seats)
+    # the counts reach C(n, n/2), which stops fitting in int64 past 62
+    dtype = np.int64 if n <= 62 else object
+    counts = np.zeros((n + 1, max_seats + 1), dtype=dtype)
+    counts[0, 0] = 1
+    for weight in seats:
+        if weight > max_seats:
+            continue
+        for size in range(n - 1, -1, -1):
+            counts[size + 1, weight:] += counts[size, :max_seats + 1 -
+                                                weight]
+    return counts
+
+
+def counts_without(counts, weight):
+    """
+    Takes a party with the given seats back out of the
+    coalition_counts table
+    """
+    max_seats = counts.shape[1] - 1
+    if weight > max_seats:
+        # too big to be counted in, nothing to take out
+        return counts
+    without = counts.copy()
+    for size in range(1, counts.shape[0]):
+        without[size, weight:] -= without[size - 1, :max_seats + 1 - weight]
+    return without
+
+
+def sensitivity_sweep(party_dict: dict, deltas, weighting='legacy'):
+    """
+    Power index of every party when it alone gains (or loses) delta
+    seats, the quota following the new total. The coalitions of the
+    other parties do not depend on the delta, so their table is built
+    once per party (taking the party out of the table of all parties)
+    and every delta is then read off its cumulative sums.
+    :param party_dict
+        dictionary of parties and their seats
+    :param deltas
+        seat changes to try, e.g. range(-10, 11)
+    :param weighting
+        see coalition_weights
+    :returns
+        dataframe of parties x deltas, NaN where a party would end up
+        with negative seats
+    """
+    all_parties = list(party_dict.keys())
+    seats = [int(party_dict[party]) for party in all_parties]
+    deltas = np.asarray(list(deltas), dtype=np.int64)
+    n, total_seats = len(seats), sum(seats)
+    multipliers, denominator = coalition_weights(n, weighting)
+    multipliers = np.array(multipliers, dtype=object)
+    counts = coalition_counts(seats, total_seats)
+
+    matrix = np.full((n, len(deltas)), np.nan)
+    for i, weight in enumerate(seats):
+        others = np.cumsum(counts_without(counts, weight)[:n], axis=1)
+        new_weight = weight + deltas
+        winning_seats = 0.5 * (total_seats + deltas) + 1
+        # swings have between winning_seats - new_weight (excluded) and
+        # winning_seats (included) seats without party i
+        high = np.clip(np.floor(winning_seats), -1, total_seats - weight)
+        low = np.clip(np.floor(winning_seats - new_weight), -1,
+                      total_seats - weight)
+        high, low = high.astype(np.int64), low.astype(np.int64)
+        swings = np.where(high >= 0, others[:, np.maximum(high, 0)], 0) - \
+            np.where(low >= 0, others[:, np.maximum(low, 0)], 0)
+        values = np.dot(swings.T.astype(object), multipliers)
+        valid = new_weight >= 0
+        matrix[i, valid] = [int(value) / denominator
+                            for value in values[valid]]
+    return pd.DataFrame(matrix, index=all_parties, columns=deltas)
+
+
+def monte_carlo_shapley(seats,
+                        winning_seats,
+                        weighting='legacy',
+                        tolerance=1e-3,
+                        batch_size=1000,
+                        max_samples=10**7,
+                        time_budget=None,
+                        value_function=None,
+                        seed=None):
+    """
+    Estimates the power indices by sampling random orderings of the
+    players in NumPy batches. In every ordering each player joins the
+    ones before it; its marginal contribution there is scaled by the
+    size of that prefix, so that the average over the orderings is the
+    index of the given weighting (for 'shapley' the scale is just 1).
+    Sampling stops once every standard error is below the tolerance,
+    max_samples orderings were drawn or time_budget seconds passed.
+    :param seats
+        list of seats of each party
+    :param winning_seats
+        number of seats that ensures the win
+    :param weighting
+        see coalition_weights
+    :param value_function
+        value of a batch of coalitions, given as a boolean
+        (coalitions x players) membership array; defaults to the
+        weighted majority game on seats and winning_seats
+    :returns
+        (values, std_errors, samples)
+    """
+    n = len(seats)
+    rng = np.random.default_rng(seed)
+    seats = np.asarray(seats)
+    multipliers, denominator = coalition_weights(n, weighting)
+    prefix_scale = np.array([
+        n * math.comb(n - 1, size) * multipliers[size] / denominator
+        for size in range(n)
+    ])
+    total = np.zeros(n)
+    total_squared = np.zeros(n)
+    samples = 0
+    started = time.perf_counter()
+    while samples < max_samples:
+        batch = min(batch_size, max_samples - samples)
+        orderings = np.argsort(rng.random((batch, n)), axis=1)
+        if value_function is None:
+            seats_after = np.cumsum(seats[orderings], axis=1)
+            seats_before = seats_after - seats[orderings]
+            marginal = ((seats_before <= winning_seats) &
+                        (seats_after > winning_seats)).astype(float)
+        else:
+            members = np.zeros((batch, n), dtype=bool)
+            marginal = np.empty((batch, n))
+            rows = np.arange(batch)
+            value_before = value_function(members)
+            for position in range(n):
+                members[rows, orderings[:, position]] = True
+                value_after = value_function(members)
+                marginal[:, position] = value_after - value_before
+                value_before = value_after
+        contributions = np.empty((batch, n))
+        np.put_along_axis(contributions, orderings, marginal * prefix_scale,
+                          axis=1)
+        total += contributions.sum(axis=0)
+        total_squared += (contributions**2).sum(axis=0)
+        samples += batch
+
+        if samples < 2 * batch_size:
+            continue
+        mean = total / samples
+        variance = np.maximum(total_squared / samples - mean**2,
+                              0) * samples / (samples - 1)
+        std_errors = np.sqrt(variance / samples)
+        if np.max(std_errors) <= tolerance:
+            break
+        if time_budget is not None and \
+                time.perf_counter() - started > time_budget:
+            break
+    mean = total / samples
+    variance = np.maximum(total_squared / samples - mean**2,
+                          0) * samples / max(samples - 1, 1)
+    return list(mean), list(np.sqrt(variance / samples)), samples
+
+
+def coalition_weights(n, weighting='legacy'):
+    """
+    Weight of a swing in a coalition of size s, s = 0 .. n-1,
+    given as integer multipliers over a common denominator so that
+    the indices are rounded only once
+    :param n
+        number of players
+    :param weighting
+        'shapley' - the Shapley-Shubik weight s!(n-s-1)!/n!
+        'legacy' - the normalisation of the original permutation
+            enumeration: every ordered coalition of every length is
+            visited and the player's inputs are divided by the number
+            of ordered coalitions it is part of. A swing of size s is
+            then seen s! * A(n-s-1) times, A(m) being the number of
+            ordered continuations sum_k m!/(m-k)!. This is what the
+            *_shapley_modified.csv files hold.
+        'banzhaf' - the (non-normalised) Banzhaf index, every
+            coalition weighs 1/2^(n-1)
+    :returns
+        (multipliers, denominator)
+    """
+    if weighting == 'shapley':
+        multipliers = [
+            math.factorial(s) * math.factorial(n - s - 1) for s in range(n)
+        ]
+        return multipliers, math.factorial(n)
+    if weighting == 'legacy':
+        continuations = [1]
+        for m in range(1, n):
+            continuations.append(1 + m * continuations[-1])
+        multipliers = [
+            math.factorial(s) * continuations[n - s - 1] for s in range(n)
+        ]
+        ordered_with_player = sum(
+            r * math.factorial(n - 1) // math.factorial(n - r)
+            for r in range(1, n + 1))
+        return multipliers, ordered_with_player
+    if weighting == 'banzhaf':
+        return [1] * n, 2**(n - 1)
+    raise ValueError(f"Unknown weighting: {weighting}")
+
+
+def indices_from_swings(swings, weighting='legacy'):
+    """
+    Turns the swing counts of each party into its power index
+    :param swings
+        swings[i][s] as returned by subset_swing_counts
+    :param weighting
+        see coalition_weights
+    """
+    multipliers, denominator = coalition_weights(len(swings), weighting)
+    return [
+        sum(int(count) * multiplier
+            for count, multiplier in zip(party_swings, multipliers)) /
+        denominator for party_swings in swings
+    ]
+
+
+def minimal_winning_coalitions(party_dict: dict, winning_seats):
+    """
+    Generates the minimal winning coalitions, the ones that lose
+    as soon as any member leaves, by branch and bound over the parties
+    sorted by seats. A losing coalition is only extended with parties
+    smaller than its members, so the first party that makes it win is
+    its smallest member and the coalition is minimal; it is not
+    extended any further. Branches that cannot reach the quota even
+    with all the remaining parties are cut.
+    :param party_dict
+        dictionary of parties and their seats
+    :param winning seats
+        number of seats that ensures the win
+    :returns (yields)
+        (coalition, seats) as soon as a coalition is found
+    """
+    if winning_seats < 0:
+        yield (), 0
+        return
+    parties = sorted(party_dict, key=party_dict.get, reverse=True)
+    seats = [party_dict[party] for party in parties]
+    remaining = list(np.cumsum(seats[::-1])[::-1]) + [0]
+    # stack of (next party to consider, members, seats of members)
+    stack = [(0, (), 0)]
+    while stack:
+        start, members, coalition_seats = stack.pop()
+        extensions = []
+        for i in range(start, len(parties)):
+            if coalition_seats + remaining[i] <= winning_seats:
+                break
+            extended_seats = coalition_seats + seats[i]
+            if extended_seats > winning_seats:
+                yield members + (parties[i], ), extended_seats
+            else:
+                extensions.append((i + 1, members + (parties[i], ),
+                                   extended_seats))
+        stack.extend(reversed(extensions))
+
+
+def connected_winning_coalitions(party_dict: dict, winning_seats, axis):
+    """
+    Generates the minimal connected winning coalitions: runs of
+    parties that are adjacent on the ideological axis, win, and lose
+    when either end of the run leaves
+    :param party_dict
+        dictionary of parties and their seats
+    :param winning seats
+        number of seats that ensures the win
+    :param axis
+        parties ordered from left to right, parties missing from
+        party_dict (e.g. without seats) are skipped
+    :returns (yields)
+        (coalition, seats)
+    """
+    if axis is None:
+        raise ValueError("Connected coalitions need an axis of parties")
+    if winning_seats < 0:
+        yield (), 0
+        return
+    parties = [party for party in axis if party in party_dict]
+    right, coalition_seats = 0, 0
+    for left in range(len(parties)):
+        while right < len(parties) and coalition_seats <= winning_seats:
+            coalition_seats += party_dict[parties[right]]
+            right += 1
+        if coalition_seats <= winning_seats:
+            break
+        if coalition_seats - party_dict[parties[left]] <= winning_seats:
+            yield tuple(parties[left:right]), coalition_seats
+        coalition_seats -= party_dict[parties[left]]
+
+
+def write_coalitions(coalitions, filename):
+    """
+    Streams (coalition, seats) pairs to a csv in the format of
+    coalition_output.csv, row by row as they are generated
+    :returns
+        number of coalitions written
+    """
+    written = 0
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Coalition', 'Seats'])
+        for coalition, coalition_seats in coalitions:
+            writer.writerow([', '.join(coalition), coalition_seats])
+            written += 1
+    return written
+
+
 def calcualte_permutation_value(party_dict: dict, permutation, winning_seats):
     """
     Calculates the winning condition for each coalition
@@ -132,66 +723,167 @@ def calcualte_permutation_value(party_dict: dict, permutation, winning_seats):
     return 0.0
 
 
-def statitstics_shapley(filenames):
-    df = pd.DataFrame()
-    for filename in filenames:
-        tmp = pd.read_csv(filename)
-        tmp['year'] = filename.replace('pl', '').replace('.csv', '')
-        df = pd.concat([df, tmp], sort=True)
-
-    # histogram
-    mean = np.mean(df['Shapley'])
-    std = np.std(df['Shapley'])
-    ax = sns.distplot(df['Shapley'],
-                    #   bins=25,
-                      rug=True,
-                      rug_kws={"color": "b"},
-                      kde_kws={
-                          "color": "r",
-                          "lw": 3,
-                          "linestyle": '--',
-                          "label": "Predicted distribution"
-                      },
-                      hist_kws={
-                          "histtype": "step",
-                          "linewidth": 3,
-                          "alpha": 1,
-                          "color": "b"
-                      })
-    ax.axvline(x=mean, label=f'Mean at = {np.around(mean,2)}', c='c', ls='--')
-    ax.axvline(x=mean + std,
-               label=f'Mean + std at {np.around(mean+std,2)}',
-               c='m',
-               ls='-.')
-    ax.axvline(x=mean - std,
-               label=f'Mean - std at {np.around(mean-std,2)}',
-               c='m',
-               ls='-.')
-    ax.set_xlim([0.0, 0.9])
-    ax.legend()
-    ax.set_ylabel("Count of values")
-    ax.set_title("Polish elections 2007-2011- distribution of Shapley values")
-    plt.savefig("Polish.png")
-    plt.show()
-
-
-filepath = './Elections/resources/eu2019.csv'
-filepath = './Elections/resources/eu2014.csv'
-filepath = './Elections/resources/eu2009.csv'
-filepath = './Elections/resources/pl2007.csv'
-# filepath = './Elections/resources/pl2011.csv'
-
-
-# filepath = './Elections/resources/test.csv'
-# compute_coalitions(filepath)
-filenames = [
-    './Elections/resources/eu2009_shapley_modified.csv',
-    './Elections/resources/eu2014_shapley_modified.csv',
-    './Elections/resources/eu2019_shapley_modified.csv'
-]
-
-filenames = [
-    './Elections/resources/pl2007_shapley_modified.csv',
-    './Elections/resources/pl2011_shapley_modified.csv'
-]
-statitstics_shapley(filenames)
+def scenario_power(scenario, party_dict, method, weighting, sampling):
+    """
+    Power indices of a single scenario, run in the worker processes
+    of run_scenarios
+    :returns
+        list of rows (Scenario, Party, Seats, Shapley[, errors])
+    """
+    all_parties = [party for party in party_dict if party_dict[party]]
+    seats = [party_dict[party] for party in all_parties]
+    winning_seats = 0.5 * sum(seats) + 1
+    with contextlib.redirect_stdout(io.StringIO()):
+        values, std_errors, _, _ = solve_game(seats, winning_seats, method,
+                                              weighting, **sampling)
+    shapley = dict(zip(all_parties, values))
+    errors = dict(zip(all_parties, std_errors or []))
+    rows = []
+    for party, party_seats in party_dict.items():
+        row = {
+            'Scenario': scenario,
+            'Party': party,
+            'Seats': party_seats,
+            'Shapley': shapley.get(party, 0.0)
+        }
+        if std_errors is not None:
+            row['Shapley_std_error'] = errors.get(party, 0.0)
+        rows.append(row)
+    return rows
+
+
+def is_seat_distribution(df):
+    """
+    Whether an elections csv holds one party per row with its seats, as
+    opposed to e.g. the coalition listings of wyniki2014.csv, whose
+    'parties' are lists of parties
+    """
+    if 'Party' not in df or 'Seats' not in df:
+        return False
+    if not pd.api.types.is_integer_dtype(df['Seats']):
+        return False
+    return not df['Party'].astype(str).str.startswith('[').any()
+
+
+def load_scenarios(sources):
+    """
+    Collects the seat distributions to analyse
+    :param sources
+        paths to
+        - directories: every *.csv in them holding a seat distribution
+          (see is_seat_distribution) is a scenario, apart from the
+          *_shapley_modified.csv outputs
+        - manifests: a csv with Scenario;Party;Seats columns holding
+          many distributions (seat swings, vacancies, mergers ...)
+        - any other elections csv, which is a single scenario
+    :returns
+        dictionary of scenario names and their party dictionaries
+    """
+    scenarios = {}
+    for source in sources:
+        directory = os.path.isdir(source)
+        if directory:
+            filenames = sorted(
+                glob.glob(os.path.join(source, '*.csv')))
+            filenames = [
+                filename for filename in filenames
+                if not filename.endswith('_shapley_modified.csv')
+            ]
+        else:
+            filenames = [source]
+        for filename in filenames:
+            df = pd.read_csv(filename, sep=';')
+            if 'Scenario' in df:
+                for scenario, group in df.groupby('Scenario', sort=False):
+                    scenarios[str(scenario)] = dict(
+                        zip(group['Party'], group['Seats']))
+            elif is_seat_distribution(df):
+                scenario = os.path.splitext(os.path.basename(filename))[0]
+                scenarios[scenario] = dict(zip(df['Party'], df['Seats']))
+            elif not directory:
+                raise ValueError(
+                    f"{filename} is not a seat distribution, expected " +
+                    "one row per party with Party and Seats columns")
+    return scenarios
+
+
+def run_scenarios(scenarios,
+                  processes=None,
+                  method='dp',
+                  weighting='legacy',
+                  **sampling):
+    """
+    Fans the scenarios out over a process pool, one scenario per task
+    :param scenarios
+        dictionary of scenario names and party dictionaries,
+        see load_scenarios
+    :param processes
+        number of worker processes, all cores by default
+    :returns
+        dataframe with a row per scenario and party
+    """
+    tasks = [(scenario, party_dict, method, weighting, sampling)
+             for scenario, party_dict in scenarios.items()]
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(scenario_power, tasks, chunksize=1)
+    return pd.DataFrame([row for rows in results for row in rows])
+
+
+def write_results(df, output):
+    """
+    Writes the consolidated results, as parquet when the output
+    ends with .parquet (needs pyarrow or fastparquet) and as csv
+    otherwise
+    """
+    if output.endswith('.parquet'):
+        df.to_parquet(output, index=False)
+    else:
+        df.to_csv(output, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Computes the power indices of election results.")
+    parser.add_argument('sources',
+                        nargs='*',
+                        help="elections csv files, directories or manifests")
+    parser.add_argument('--output', default='power_indices.csv')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--method',
+                        default='dp',
+                        choices=['subsets', 'dp', 'monte_carlo'])
+    parser.add_argument('--weighting',
+                        default='legacy',
+                        choices=['legacy', 'shapley', 'banzhaf'])
+    parser.add_argument('--tolerance', type=float, default=1e-3)
+    parser.add_argument('--time-budget', dest='time_budget', type=float)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument(
+        '--statistics',
+        nargs='+',
+        help="*_shapley_modified.csv or elections csv files to plot")
+    args = parser.parse_args()
+
+    if not args.sources and not args.statistics:
+        parser.print_help()
+        return
+    if args.sources:
+        sampling = {}
+        if args.method == 'monte_carlo':
+            sampling = dict(tolerance=args.tolerance,
+                            time_budget=args.time_budget,
+                            seed=args.seed)
+        scenarios = load_scenarios(args.sources)
+        print(f"Running {len(scenarios)} scenarios")
+        df = run_scenarios(scenarios, args.processes, args.method,
+                           args.weighting, **sampling)
+        write_results(df, args.output)
+        print(f"Results written to {args.output}")
+    if args.statistics:
+        # seaborn and matplotlib are only loaded when plotting
+        from plotting import statitstics_shapley
+        statitstics_shapley(args.statistics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import seaborn as sns
+import matplotlib.pyplot as plt
+
+from coalitions import shapley_frame
+
+
+def statitstics_shapley(filenames):
+    """
+    Plots the distribution of the Shapley values, read from the
+    *_shapley_modified.csv files or, for plain elections csv files,
+    from the cache
+    """
+    df = pd.DataFrame()
+    for filename in filenames:
+        if filename.endswith('_shapley_modified.csv'):
+            tmp = pd.read_csv(filename)
+        else:
+            tmp = shapley_frame(filename)
+        tmp['year'] = filename.replace('pl', '').replace('.csv', '')
+        df = pd.concat([df, tmp], sort=True)
+
+    # histogram
+    mean = np.mean(df['Shapley'])
+    std = np.std(df['Shapley'])
+    ax = sns.distplot(df['Shapley'],
+                    #   bins=25,
+                      rug=True,
+                      rug_kws={"color": "b"},
+                      kde_kws={
+                          "color": "r",
+                          "lw": 3,
+                          "linestyle": '--',
+                          "label": "Predicted distribution"
+                      },
+                      hist_kws={
+                          "histtype": "step",
+                          "linewidth": 3,
+                          "alpha": 1,
+                          "color": "b"
+                      })
+    ax.axvline(x=mean, label=f'Mean at = {np.around(mean,2)}', c='c', ls='--')
+    ax.axvline(x=mean + std,
+               label=f'Mean + std at {np.around(mean+std,2)}',
+               c='m',
+               ls='-.')
+    ax.axvline(x=mean - std,
+               label=f'Mean - std at {np.around(mean-std,2)}',
+               c='m',
+               ls='-.')
+    ax.set_xlim([0.0, 0.9])
+    ax.legend()
+    ax.set_ylabel("Count of values")
+    ax.set_title("Polish elections 2007-2011- distribution of Shapley values")
+    plt.savefig("Polish.png")
+    plt.show()
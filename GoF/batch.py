@@ -0,0 +1,53 @@
+"""
+Many independent Game of Life boards of the same size stepped and
+counted together, as one (B, N, N) array of 0/1 cells.
+
+Stepping is a single neighbour sum over the stack per generation, the
+census a single labelling pass over the boards laid one under the
+other, so small boards do not pay the Python overhead of a run each.
+"""
+import numpy as np
+
+from stepping import life_rule, neighbour_count
+
+
+def step_batch(alive):
+    """
+    Next generation of every board of a (B, N, N) stack (toroidal)
+    """
+    return life_rule(alive, neighbour_count(alive)).astype(np.uint8)
+
+
+def census_batch(table, alive):
+    """
+    Matches of every pattern name of the table on every board
+    :param table
+        census.PatternTable
+    :returns
+        (B, names) array of counts, names in the order of table.names
+    """
+    B, N, M = alive.shape
+    found = table.match_alive(alive.reshape(B * N, M))
+    counts = np.zeros((B, len(table.names)), dtype=np.int64)
+    for name, template, (r, _) in zip(table.template_names, table.templates,
+                                      found):
+        # windows running over into the next board of the stack
+        inside = r % N + template.shape[0] <= N
+        counts[:, table.names.index(name)] += np.bincount(r[inside] // N,
+                                                          minlength=B)
+    return counts
+
+
+def run_batch(table, alive, generations):
+    """
+    Census of every generation of every board, then a step
+    :returns
+        (B, generations, names) array of counts and the boards after
+        the last generation
+    """
+    counts = np.zeros((alive.shape[0], generations, len(table.names)),
+                      dtype=np.int64)
+    for generation in range(generations):
+        counts[:, generation] = census_batch(table, alive)
+        alive = step_batch(alive)
+    return counts, alive
@@ -0,0 +1,79 @@
+"""
+Scaling of the band-parallel engine over 1..N workers, against the
+single-core numpy engine.
+
+    python GoF/bench_parallel.py --size 10000 --generations 10
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from parallel import ParallelStepper
+from stepping import ON, OFF, step
+
+
+def seconds_per_generation(run, generations):
+    started = time.perf_counter()
+    run(generations)
+    return (time.perf_counter() - started) / generations
+
+
+def check_thread_steppers(size=64, generations=5):
+    """
+    Two thread-pool steppers alive at once in this process keep their
+    own boards, also once the other one is closed
+    """
+    rng = np.random.default_rng(1)
+    grids = [np.where(rng.random((size, size + 8 * i)) < 0.3, ON,
+                      OFF).astype(np.uint8) for i in range(2)]
+    expected = list(grids)
+    steppers = [ParallelStepper(2, threads=True) for _ in grids]
+    for _ in range(generations):
+        for i, stepper in enumerate(steppers):
+            grids[i] = stepper(grids[i])
+            expected[i] = step(expected[i])
+            assert (grids[i] == expected[i]).all()
+    steppers[0].close()
+    assert (steppers[1](grids[1]) == step(expected[1])).all()
+    steppers[1].close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the parallel Game of Life engine.")
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--generations', type=int, default=10)
+    parser.add_argument('--max-processes', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', action='store_true')
+    args = parser.parse_args()
+    check_thread_steppers()
+
+    rng = np.random.default_rng(0)
+    grid = np.where(rng.random((args.size, args.size)) < 0.2, ON,
+                    OFF).astype(np.uint8)
+
+    def serial(generations):
+        board = grid
+        for _ in range(generations):
+            board = step(board)
+        return board
+
+    baseline = seconds_per_generation(serial, args.generations)
+    expected = serial(args.generations)
+    print(f"N={args.size}, numpy: {baseline * 1000:.0f} ms/generation")
+    for processes in range(1, args.max_processes + 1):
+        with ParallelStepper(processes, threads=args.threads) as stepper:
+            stepper.load(grid)
+            # first round trip starts the workers
+            stepper.run(1)
+            stepper.load(grid)
+            took = seconds_per_generation(stepper.run, args.generations)
+            assert (stepper.alive == (expected == ON)).all()
+        print(f"{processes} workers: {took * 1000:.0f} ms/generation, " +
+              f"speedup {baseline / took:.2f}")
+
+
+if __name__ == '__main__':
+    main()
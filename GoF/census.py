@@ -0,0 +1,368 @@
+"""
+Single-pass census of known patterns on a Game of Life grid.
+
+The templates are the padded arrays of game.py and pattern.py: the
+pattern with a dead border of one cell, so a match means the pattern
+cells are alive and everything around them, inside the window, is dead.
+Matches are counted like cv2.matchTemplate with a zero difference:
+every placement of a template fully inside the grid that equals it.
+
+Instead of sliding every template over the board, the live cells are
+labelled once into 8-connected components. The dead border means the
+first part of a matching pattern (the part holding its first live cell
+in row-major order) is a whole component of the grid, so each component
+is hashed by its shape and looked up among the first parts of the
+templates; only those candidates are compared with the full window.
+The cost is one labelling pass whatever the number of templates.
+"""
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from stepping import ON
+
+
+def components(alive):
+    """
+    8-connected components of a 0/1 uint8 array
+    :returns
+        labels array and (top, left, height, width, area) arrays of the
+        components, the background excluded
+    """
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(alive,
+                                                           connectivity=8)
+    stats = stats[1:]
+    return labels, (stats[:, cv2.CC_STAT_TOP], stats[:, cv2.CC_STAT_LEFT],
+                    stats[:, cv2.CC_STAT_HEIGHT], stats[:, cv2.CC_STAT_WIDTH],
+                    stats[:, cv2.CC_STAT_AREA])
+
+
+class PatternTable:
+    def __init__(self, patterns, seed=0):
+        """
+        :param patterns
+            list of (name, template) pairs, templates padded with a dead
+            border; several templates can share a name (phases,
+            orientations) and are counted together
+        :param seed
+            seed of the random multipliers of the shape hash
+        """
+        self.names = list(dict.fromkeys(name for name, _ in patterns))
+        self.template_names = [name for name, _ in patterns]
+        self.templates = []
+        anchors = []
+        for name, template in patterns:
+            template = np.asarray(template) == ON
+            if template[[0, -1]].any() or template[:, [0, -1]].any():
+                raise ValueError(f"Template of {name} needs a dead border")
+            if not template.any():
+                raise ValueError(f"Template of {name} has no live cells")
+            self.templates.append(template)
+            labels, (top, left, height, width, _) = components(
+                template.astype(np.uint8))
+            first = labels[template][0] - 1
+            part = labels[top[first]:top[first] + height[first],
+                          left[first]:left[first] + width[first]] == first + 1
+            anchors.append((top[first], left[first], part))
+
+        # shape hash: random 64-bit multiplier per cell of a frame large
+        # enough for any first part, the part sits in its top left corner
+        self.max_height = max(part.shape[0] for _, _, part in anchors)
+        self.max_width = max(part.shape[1] for _, _, part in anchors)
+        self.max_area = max(int(part.sum()) for _, _, part in anchors)
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(0,
+                                        2**64,
+                                        (self.max_height, self.max_width),
+                                        dtype=np.uint64)
+        self.offsets = [(top, left) for top, left, _ in anchors]
+        self.anchor_hashes = np.array(
+            [self.multipliers[:part.shape[0], :part.shape[1]][part].sum(
+                dtype=np.uint64) for _, _, part in anchors],
+            dtype=np.uint64)
+
+    def candidates(self, alive):
+        """
+        Components small enough to be the first part of a template,
+        with their shape hashes
+        :returns
+            (top, left, hashes) arrays of the candidate components
+        """
+        labels, (top, left, height, width, area) = components(alive)
+        small = ((height <= self.max_height) & (width <= self.max_width) &
+                 (area <= self.max_area))
+        label = np.nonzero(small)[0] + 1
+        top, left = top[small], left[small]
+        height, width = height[small], width[small]
+        N, M = alive.shape
+        dr = np.arange(self.max_height)
+        dc = np.arange(self.max_width)
+        # frames past the edge of the grid are clipped, and masked out
+        # with everything past the bounding box of the component
+        rows = np.minimum(top[:, None] + dr, N - 1)[:, :, None]
+        cols = np.minimum(left[:, None] + dc, M - 1)[:, None, :]
+        part = ((labels[rows, cols] == label[:, None, None]) &
+                (dr[None, :, None] < height[:, None, None]) &
+                (dc[None, None, :] < width[:, None, None]))
+        hashes = (part * self.multipliers).sum(axis=(1, 2), dtype=np.uint64)
+        return top, left, hashes
+
+    def match(self, grid):
+        """
+        Top left corners of all the template windows equal to the grid
+        :returns
+            list with a (rows, cols) pair of arrays per template
+        """
+        return self.match_alive((grid == ON).astype(np.uint8))
+
+    def match_alive(self, alive):
+        """
+        match on a 0/1 uint8 array
+        """
+        N, M = alive.shape
+        top, left, hashes = self.candidates(alive)
+        found = []
+        for (oy, ox), anchor, template in zip(self.offsets,
+                                              self.anchor_hashes,
+                                              self.templates):
+            H, W = template.shape
+            rows, cols = top[hashes == anchor] - oy, left[hashes == anchor] - ox
+            inside = (rows >= 0) & (cols >= 0) & (rows + H <= N) & (cols + W
+                                                                  <= M)
+            rows, cols = rows[inside], cols[inside]
+            window = alive[(rows[:, None] + np.arange(H))[:, :, None],
+                           (cols[:, None] + np.arange(W))[:, None, :]]
+            equal = (window == template).all(axis=(1, 2))
+            found.append((rows[equal], cols[equal]))
+        return found
+
+    def count(self, grid):
+        """
+        Number of matches of every pattern name, zero for the ones not
+        found
+        """
+        counts = Counter({name: 0 for name in self.names})
+        for name, (rows, _) in zip(self.template_names, self.match(grid)):
+            counts[name] += len(rows)
+        return counts
+
+
+class IncrementalCensus:
+    def __init__(self, table, tile=16, period=2, stepper=None):
+        """
+        Census kept up to date between generations: the match counts are
+        stored per tile of window corners, and a tile is matched again
+        only when a cell in reach of its windows changed. Drop-in for
+        PatternTable.count, worth it on boards where little changes
+        (seeded boards, late-phase soups); on young random boards nearly
+        every tile changes and PatternTable.count is as fast.
+        :param table
+            PatternTable of the patterns to count
+        :param tile
+            side of the tiles in cells
+        :param period
+            number of past generations a tile is compared with; with 2,
+            tiles of period-2 oscillators (blinkers, toads, beacons) take
+            the counts of two generations ago instead of being matched
+        :param stepper
+            tiled.TiledStepper stepping the board; while each grid is its
+            last output, the changed tiles and live cells are taken from
+            it instead of comparing whole boards, and the past boards are
+            brought forward in the changed tiles only, so a settled board
+            costs next to nothing (its tile size is used)
+        """
+        self.table = table
+        self.stepper = stepper
+        self.tile = stepper.tile if stepper is not None else tile
+        self.period = period
+        self.height = max(t.shape[0] for t in table.templates)
+        self.width = max(t.shape[1] for t in table.templates)
+        # (alive, counts per tile) of the last generations, newest first
+        self.history = []
+        # (run, generation) of the stepper the last counted grid was at,
+        # and its changed tiles of the steps since, newest first
+        self.seen = None
+        self.steps = []
+
+    def reach(self, changed):
+        """
+        Tiles holding a window corner whose window covers a changed
+        tile, the tiles from the tile down and right by the template size
+        """
+        T = self.tile
+        dirty = changed.copy()
+        for di in range(-(-(self.height - 1) // T) + 1):
+            for dj in range(-(-(self.width - 1) // T) + 1):
+                dirty[:dirty.shape[0] - di, :dirty.shape[1] -
+                      dj] |= changed[di:, dj:]
+        return dirty
+
+    def dirty_tiles(self, changed):
+        """
+        Tiles whose windows cover a changed cell
+        """
+        T = self.tile
+        N, M = changed.shape
+        tiles = (-(-N // T), -(-M // T))
+        if N % T:
+            changed = np.concatenate(
+                [changed, np.zeros((tiles[0] * T - N, M), dtype=bool)])
+        # bands of T rows first, a contiguous and cheap reduction
+        changed = changed.reshape(tiles[0], T, M).any(axis=1)
+        changed = np.logical_or.reduceat(changed, np.arange(0, M, T), axis=1)
+        return self.reach(changed)
+
+    def crops(self, alive, ti, tj):
+        """
+        Crops of the given tiles: every window with its corner in the
+        tile, dead beyond the grid
+        :returns
+            (tiles, T + height - 1, T + width - 1) array
+        """
+        T = self.tile
+        N, M = alive.shape
+        rows = ti[:, None] * T + np.arange(T + self.height - 1)
+        cols = tj[:, None] * T + np.arange(T + self.width - 1)
+        crops = alive[np.minimum(rows, N - 1)[:, :, None],
+                      np.minimum(cols, M - 1)[:, None, :]]
+        crops *= (rows < N)[:, :, None] & (cols < M)[:, None, :]
+        return crops
+
+    def unchanged(self, alive, old_alive, tiles):
+        """
+        Tiles, among the given ones, whose windows are the same on both
+        boards; a few tiles are compared by their crops, many by a
+        comparison of the whole boards
+        """
+        if tiles.mean() > 0.25:
+            return tiles & ~self.dirty_tiles(alive != old_alive)
+        ti, tj = np.nonzero(tiles)
+        same = (self.crops(alive, ti, tj) == self.crops(old_alive, ti,
+                                                         tj)).all(axis=(1, 2))
+        unchanged = np.zeros_like(tiles)
+        unchanged[ti[same], tj[same]] = True
+        return unchanged
+
+    def match_tiles(self, alive, dirty):
+        """
+        Match counts of the dirty tiles, from a census of their crops
+        stacked into a single mosaic, or of the whole grid when most
+        tiles are dirty
+        :returns
+            (dirty tiles, templates) array of counts
+        """
+        T = self.tile
+        N, M = alive.shape
+        templates = self.table.templates
+        if dirty.mean() > 0.5:
+            counts = np.zeros(dirty.shape + (len(templates), ),
+                              dtype=np.int64)
+            for index, (r, c) in enumerate(self.table.match_alive(alive)):
+                np.add.at(counts[:, :, index], (r // T, c // T), 1)
+            return counts[dirty]
+
+        ti, tj = np.nonzero(dirty)
+        crops = self.crops(alive, ti, tj)
+        CH, CW = crops.shape[1:]
+        found = self.table.match_alive(crops.reshape(-1, CW))
+
+        counts = np.zeros((len(ti), len(templates)), dtype=np.int64)
+        for index, (template, (r, c)) in enumerate(zip(templates, found)):
+            H, W = template.shape
+            crop, r = r // CH, r % CH
+            # corner in the tile (so inside the crop) and window on the grid
+            keep = ((r < T) & (c < T) & (ti[crop] * T + r + H <= N) &
+                    (tj[crop] * T + c + W <= M))
+            np.add.at(counts[:, index], crop[keep], 1)
+        return counts
+
+    def changes(self, grid):
+        """
+        0/1 cells of the grid and the dirty tiles since the last counted
+        generation, None when they are not known
+        """
+        stepper = self.stepper
+        if stepper is not None and stepper.follows(grid):
+            # continued from the last counted grid, by one step
+            known = (self.history and
+                     self.seen == (stepper.run, stepper.generation - 1))
+            self.seen = (stepper.run, stepper.generation)
+            if not known:
+                self.steps = []
+                return stepper.alive, None
+            self.steps = [stepper.changed] + self.steps[:self.period - 1]
+            changed = stepper.changed.copy()
+            # the last tiles of an uneven board run over into the first
+            N, M = grid.shape
+            if N % self.tile:
+                changed[0] |= changed[-1]
+            if M % self.tile:
+                changed[:, 0] |= changed[:, -1]
+            return stepper.alive, self.reach(changed)
+        self.seen = None
+        self.steps = []
+        alive = (grid == ON).astype(np.uint8)
+        if not self.history or alive.shape != self.history[0][0].shape:
+            return alive, None
+        return alive, self.dirty_tiles(alive != self.history[0][0])
+
+    def remember(self, alive, counts):
+        """
+        Puts a counted generation in front of the history. The stepper's
+        board keeps changing, so the oldest past board is brought up to
+        it in the tiles changed since (all of it when many did), or it is
+        copied when those are not known.
+        """
+        stepper = self.stepper
+        if stepper is not None and alive is stepper.alive:
+            if len(self.history) == self.period and \
+                    len(self.steps) == self.period:
+                board = self.history[-1][0]
+                changed = np.logical_or.reduce(self.steps)
+                # gathering tiles costs as much as copying the whole
+                # board once about 1% of them changed
+                if changed.mean() > 0.01:
+                    np.copyto(board, alive)
+                else:
+                    ti, tj = np.nonzero(changed)
+                    rows, cols = stepper.tile_indices(ti, tj)
+                    cells = (rows[:, :, None], cols[:, None, :])
+                    board[cells] = alive[cells]
+                alive = board
+            else:
+                alive = alive.copy()
+        self.history = [(alive, counts)] + self.history[:self.period - 1]
+
+    def count(self, grid):
+        """
+        Number of matches of every pattern name, as PatternTable.count
+        """
+        alive, dirty = self.changes(grid)
+        if dirty is None:
+            T = self.tile
+            tiles = (-(-alive.shape[0] // T), -(-alive.shape[1] // T))
+            counts = self.match_tiles(alive, np.ones(tiles, dtype=bool))
+            counts = counts.reshape(tiles + (-1, ))
+            self.history = []
+            self.totals = counts.sum(axis=(0, 1))
+        else:
+            previous = self.history[0][1]
+            counts = previous.copy()
+            stale = dirty
+            # tiles equal to an older generation take its counts
+            for old_alive, old_counts in self.history[1:]:
+                if not stale.any():
+                    break
+                same = self.unchanged(alive, old_alive, stale)
+                counts[same] = old_counts[same]
+                stale = stale & ~same
+            if stale.any():
+                counts[stale] = self.match_tiles(alive, stale)
+            self.totals += (counts - previous).sum(axis=(0, 1))
+        self.remember(alive, counts)
+
+        counts = Counter({name: 0 for name in self.table.names})
+        for name, total in zip(self.table.template_names, self.totals):
+            counts[name] += int(total)
+        return counts
@@ -0,0 +1,204 @@
+"""
+Ensembles of random Game of Life runs: replicas of every combination
+of board size, density and number of generations, run over a process
+pool and summarised per pattern.
+
+    python GoF/ensemble.py --sizes 200 500 --densities 0.2 0.5 0.8 \
+        --generations 50 --replicas 20 --output ensemble.csv
+
+Every replica draws its board from its own seed, spawned from the root
+seed by replica number, so results do not depend on the pool or the
+order the tasks finish in, and replica r of every configuration starts
+from the same random stream.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+from batch import run_batch
+from census import PatternTable
+from library import load_library
+from stepping import ON, OFF, step
+
+# the patterns of pattern.py
+PATTERNS = ['blinker', 'beehive', 'tub', 'block', 'beacon', 'toad']
+PATTERN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'resources', 'patterns')
+# engines that run inside a pool worker, which cannot start processes
+# of its own (so not 'parallel')
+ENGINES = ['numpy', 'scipy', 'packed', 'tiled']
+
+
+def pattern_table(patterns=None):
+    return PatternTable(
+        load_library([
+            os.path.join(PATTERN_DIR, f'{name}.txt')
+            for name in (patterns or PATTERNS)
+        ]))
+
+
+def random_board(N, density, seed):
+    """
+    N x N board with cells ON with probability density, as the
+    np.random.choice draw of pattern.py
+    """
+    rng = np.random.default_rng(seed)
+    return rng.choice([ON, OFF], N * N,
+                      p=[density, 1.0 - density]).reshape(N, N)
+
+
+def replica(N, density, generations, index, seed, patterns, engine):
+    """
+    One run from a random board
+    :returns
+        row with the configuration and the number of matches of every
+        pattern summed over the generations (cumulative_statistics of
+        pattern.py)
+    """
+    table = pattern_table(patterns)
+    grid = random_board(N, density, seed)
+    totals = dict.fromkeys(table.names, 0)
+    for _ in range(generations):
+        for name, count in table.count(grid).items():
+            totals[name] += count
+        grid = step(grid, engine)
+    row = {
+        'N': N,
+        'density': density,
+        'generations': generations,
+        'replica': index
+    }
+    row.update(totals)
+    return row
+
+
+def replica_batch(N, density, generations, indices, seeds, patterns):
+    """
+    Several replicas of a configuration stepped and counted together
+    (see batch.py), with the boards and rows of replica
+    """
+    table = pattern_table(patterns)
+    alive = np.stack([random_board(N, density, seed) == ON
+                      for seed in seeds]).astype(np.uint8)
+    counts, _ = run_batch(table, alive, generations)
+    rows = []
+    for index, totals in zip(indices, counts.sum(axis=1)):
+        row = {
+            'N': N,
+            'density': density,
+            'generations': generations,
+            'replica': int(index)
+        }
+        row.update(zip(table.names, totals.tolist()))
+        rows.append(row)
+    return rows
+
+
+def run_ensemble(sizes,
+                 densities,
+                 generations,
+                 replicas,
+                 seed=0,
+                 processes=None,
+                 patterns=None,
+                 engine='numpy',
+                 batch=1):
+    """
+    Runs replicas of every (N, density, generations) combination over a
+    process pool
+    :param replicas
+        number of random boards per combination
+    :param seed
+        root seed, replica r draws from SeedSequence(seed).spawn(...)[r]
+    :param processes
+        number of worker processes, all cores by default
+    :param engine
+        one of ENGINES
+    :param batch
+        replicas stepped together as one array in a task, for many small
+        boards (the engine is then not used)
+    :returns
+        dataframe with a row per replica, see replica
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Engine {engine!r} cannot run in the pool " +
+                         f"workers, use one of {ENGINES}")
+    seeds = np.random.SeedSequence(seed).spawn(replicas)
+    if batch > 1:
+        tasks = [(N, density, length, indices, [seeds[i] for i in indices],
+                  patterns)
+                 for N, density, length in itertools.product(
+                     sizes, densities, generations)
+                 for indices in np.array_split(np.arange(replicas),
+                                               -(-replicas // batch))]
+        with multiprocessing.Pool(processes) as pool:
+            rows = pool.starmap(replica_batch, tasks, chunksize=1)
+        return pd.DataFrame([row for chunk in rows for row in chunk])
+    tasks = [(N, density, length, index, seeds[index], patterns, engine)
+             for N, density, length in itertools.product(
+                 sizes, densities, generations)
+             for index in range(replicas)]
+    with multiprocessing.Pool(processes) as pool:
+        rows = pool.starmap(replica, tasks, chunksize=1)
+    return pd.DataFrame(rows)
+
+
+def summarise(df):
+    """
+    Mean, standard deviation and 95% confidence interval of the mean
+    of every pattern over the replicas of each configuration
+    :returns
+        dataframe with a row per configuration and pattern
+    """
+    keys = ['N', 'density', 'generations']
+    patterns = [c for c in df.columns if c not in keys + ['replica']]
+    long = df.melt(id_vars=keys + ['replica'],
+                   value_vars=patterns,
+                   var_name='pattern',
+                   value_name='count')
+    summary = long.groupby(keys + ['pattern'], sort=False)['count'].agg(
+        ['mean', 'std', 'count']).reset_index()
+    summary = summary.rename(columns={'count': 'replicas'})
+    summary = summary.sort_values(keys, kind='stable', ignore_index=True)
+    std_error = summary['std'] / np.sqrt(summary['replicas'])
+    summary['ci_low'] = summary['mean'] - 1.96 * std_error
+    summary['ci_high'] = summary['mean'] + 1.96 * std_error
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs ensembles of random Game of Life boards.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500])
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.8])
+    parser.add_argument('--generations', type=int, nargs='+', default=[50])
+    parser.add_argument('--replicas', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--engine', default='numpy', choices=ENGINES)
+    parser.add_argument('--batch',
+                        type=int,
+                        default=1,
+                        help="replicas stepped together in one array")
+    parser.add_argument('--output', default='ensemble.csv')
+    parser.add_argument('--replica-output',
+                        dest='replica_output',
+                        help="csv of the single replicas")
+    args = parser.parse_args()
+
+    df = run_ensemble(args.sizes, args.densities, args.generations,
+                      args.replicas, args.seed, args.processes,
+                      engine=args.engine,
+                      batch=args.batch)
+    if args.replica_output:
+        df.to_csv(args.replica_output, index=False)
+    summarise(df).to_csv(args.output, index=False)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,12 @@ import numpy as np
 import matplotlib.pyplot as plt 
 import matplotlib.animation as animation 
 import os
-import re
+
+from census import IncrementalCensus, PatternTable
+from library import load_library, read_cells, template
+from sinks import MultiSink, RollingStats, open_sink
+from stepping import STEPPERS, step
+from tiled import default_stepper as tiled_stepper
 
 filename='test.txt'
 
@@ -24,67 +29,10 @@ def fill_from_file(i, j, grid, filename):
 		grid[int(values[0])+i, int(values[1])+i] = 255
 
 def read_pattern(pattern):
-	with open(os.path.join(os.path.dirname(__file__), 'resources', 'patterns', f'{pattern}.txt')) as f:
-		content = f.readlines()
-	values = []
-	max_width, max_height = 0, 0
-	content = [x.strip() for x in content]
-	for index in range(content.__len__()):
-		sep = content[index].index(',')
-		x = int(content[index][0:sep])
-		y = int(content[index][sep+1:content[index].__len__()])
-		if x > max_width:
-			max_width = x
-		if y > max_height:
-			max_height = y
-		values.append([x,y])
-	pattern = np.zeros(shape=(max_width+2, max_height+2), dtype=int)
-	for coord in values:
-		pattern[coord[0], coord[1]] = 255
-	return pattern
+	return template(read_cells(os.path.join(os.path.dirname(__file__), 'resources', 'patterns', f'{pattern}.txt')))
 
 def count_pattern_on_grid(grid, patterns):
-	N = len(grid)
-	x, y = patterns[0].shape
-	counter = 0
-	diff = 0
-	x_cut = 1 if x/2 == 0 else 2
-	y_cut = 1 if y/2 == 0 else 2
-	for i in range(int(N-x/2)-x_cut):
-		for j in range(int(N-y/2)-y_cut):
-			for pattern in patterns:
-				try:
-					for idx in range(x):
-						for idy in range(y):
-							g = int(grid[i+idx, j+idy])
-							p = pattern[idx, idy]
-							if g != p:
-								raise KeyError
-					counter += 1
-				except:
-					t = 0
-	return counter
-
-def add_extra_patterns_of_glider(patterns_grid):
-	base_patterns = patterns_grid['glider']
-	extra_patterns = []
-	for base_pattern in base_patterns:
-		transpose = base_pattern.transpose()
-		extra_patterns.append(transpose)
-		
-	for ex_pattern in extra_patterns:
-		for p in base_patterns:
-			cnt = 0
-			x, y = p.shape
-			for idx in range(x-1):
-				for idy in range(y-1):
-					if p[idx][idy] == ex_pattern[idx][idy]:
-						cnt+=1
-			if cnt == 25:
-				print("duplicated")
-		v = 0
-		patterns_grid['glider'].append(ex_pattern)
-
+	return sum(PatternTable([('', pattern) for pattern in patterns]).count(grid).values())
 
 def random_grid(N):
 
@@ -130,52 +78,15 @@ def add_gosper_glider_gun(i, j, grid):
 
 	grid[i:i+11, j:j+38] = gun 
 
-def update(frameNum, img, grid, N, patterns_grid, logger):
-	statistics = dict()
-	print('--- NEW ITERATION ---')
-	logger.append('Next iteration')
-	for pattern in patterns_grid:
-		counter =0
-		if not pattern in statistics.keys():
-			statistics[pattern] = 0
-
-		if pattern == 'blinker':
-			counter += count_pattern_on_grid(grid, [patterns_grid[pattern][0]])
-			counter += count_pattern_on_grid(grid, [patterns_grid[pattern][1]])
-		else:
-			counter += count_pattern_on_grid(grid, patterns_grid[pattern])
-
-		statistics[pattern] = counter
-
-		print(f'pattern:{pattern} -> counter:{counter}')
-		logger.append(f'pattern:{pattern} -> counter:{counter}')
-
-	print(statistics)
-	# copy grid since we require 8 neighbors
-	# for calculation and we go line by line 
-	newGrid = grid.copy()
-	for i in range(N):
-		for j in range(N):
-			# compute 8-neghbor sum 
-			# using toroidal boundary conditions - x and y wrap around 
-			# so that the simulaton takes place on a toroidal surface. 
-			total = int((grid[i, (j-1)%N] + grid[i, (j+1)%N] +
-						grid[(i-1)%N, j] + grid[(i+1)%N, j] +
-						grid[(i-1)%N, (j-1)%N] + grid[(i-1)%N, (j+1)%N] +
-						grid[(i+1)%N, (j-1)%N] + grid[(i+1)%N, (j+1)%N])/255) 
-
-			# apply Conway's rules 
-			if grid[i, j] == ON: 
-				if (total < 2) or (total > 3): 
-					newGrid[i, j] = OFF 
-			else: 
-				if total == 3: 
-					newGrid[i, j] = ON 
+def update(frameNum, img, grid, N, patterns_grid, sink, engine='numpy'):
+	# one census pass counts every pattern of the table, the row streams to the sink
+	statistics = patterns_grid.count(grid)
+	sink.append(statistics)
+	newGrid = step(grid, engine)
 
 	# update data 
 	img.set_data(newGrid) 
 	grid[:] = newGrid[:]
-	print('')
 	return img, 
 
 # main() function 
@@ -193,20 +104,14 @@ def main():
 	parser.add_argument('--glider', action='store_true', required=False) 
 	parser.add_argument('--gosper', action='store_true', required=False)
 	parser.add_argument('--file', dest='file', required=False)
+	parser.add_argument('--statistics', dest='statistics', required=False)
+	parser.add_argument('--engine', dest='engine', default=None, choices=list(STEPPERS), required=False)
 
 	args = parser.parse_args()
-	#Trzeba robic reshape na glider bo statek moze sie poruszac w inne strony
-	patterns = ['block', 'tub', 'pond', 'blinker_1', 'blinker_2']
-	for x in range(1,8):
-		patterns.append(f'glider_{x}')
-	patterns_grid = dict()
-	for pattern in patterns:
-		pattern_aggregate = re.sub("_\d+", "", pattern)
-		if not pattern_aggregate in patterns_grid.keys():
-			patterns_grid[pattern_aggregate] = []
-		patterns_grid[pattern_aggregate].append(read_pattern(pattern))
-
-	#add_extra_patterns_of_glider(patterns_grid)
+	# all orientations and phases (glider directions, blinker phases) come from the library
+	patterns = ['block', 'tub', 'pond', 'blinker', 'glider']
+	patterns_list = load_library([os.path.join(os.path.dirname(__file__), 'resources', 'patterns', f'{pattern}.txt') for pattern in patterns])
+	pattern_table = PatternTable(patterns_list)
 
 	# set grid size
 	N = 100
@@ -236,14 +141,25 @@ def main():
 	else: # populate grid with random on/off - 
 			# more off than on 
 		grid = random_grid(N)
+	# seeded boards are mostly empty, only step the tiles that change
+	engine = args.engine
+	if engine is None:
+		engine = 'tiled' if args.glider or args.gosper or args.file else 'numpy'
+	# the tiled engine tells which tiles changed, only those are re-matched (random boards change everywhere)
+	if engine == 'tiled':
+		pattern_table = IncrementalCensus(pattern_table, stepper=tiled_stepper)
 	#l = patterns_grid['glider']
 	#counter = count_pattern_on_grid(grid, l)
-	logger = []
+	# census rows go to the --statistics file (csv, or a .parquet directory), rolling means are kept online
+	rolling = RollingStats(window=10)
+	sink = rolling
+	if args.statistics:
+		sink = MultiSink([open_sink(args.statistics), rolling])
 	# set up animation
 	fig, ax = plt.subplots() 
 	img = ax.imshow(grid, interpolation='nearest')
 	#update(img, grid, N, patterns_grid, logger)
-	ani = animation.FuncAnimation(fig, update, fargs=(img, grid, N, patterns_grid, logger),
+	ani = animation.FuncAnimation(fig, update, fargs=(img, grid, N, pattern_table, sink, engine),
 								frames = 10,
 								interval=update_interval,
 								save_count=50) 
@@ -253,7 +169,8 @@ def main():
 	if args.movfile: 
 		ani.save(args.movfile, fps=30, extra_args=['-vcodec', 'libx264']) 
 	plt.show()
-	print(logger.__len__())
+	sink.close()
+	print(f'mean over the last {rolling.window} frames: {rolling.rolling_mean()}')
 
 # call main 
 if __name__ == '__main__': 
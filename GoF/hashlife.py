@@ -0,0 +1,289 @@
+"""
+Hashlife engine: the board is a quadtree of canonical (hash-consed)
+nodes and the successor of every node is memoised, so regular or
+sparse universes can be jumped 2^k generations at a time.
+
+Unlike the grids of game.py and pattern.py the universe is an
+infinite plane, there is no toroidal wrap. Coordinates are
+(row, column), as in the pattern files.
+"""
+import os
+
+import numpy as np
+
+from stepping import ON, OFF
+
+
+class Node:
+    """
+    Square of 2^k x 2^k cells made of four quadrants
+    a (north west), b (north east), c (south west), d (south east).
+    Nodes are only created through Hashlife.join, so equal squares are
+    the same object and can be compared and hashed by identity.
+    """
+    __slots__ = ('k', 'a', 'b', 'c', 'd', 'n')
+
+    def __init__(self, k, a, b, c, d, n):
+        self.k = k
+        self.a, self.b, self.c, self.d = a, b, c, d
+        # population
+        self.n = n
+
+
+class Hashlife:
+    def __init__(self, max_nodes=2_000_000):
+        """
+        :param max_nodes
+            once the node cache grows past this, everything not
+            reachable from the current universe is dropped
+        """
+        self.max_nodes = max_nodes
+        self.off = Node(0, None, None, None, None, 0)
+        self.on = Node(0, None, None, None, None, 1)
+        self.nodes = {}
+        self.successors = {}
+        self.empties = [self.off]
+        self.root = self.empty(3)
+        # cell of the top left corner of the root
+        self.top, self.left = 0, 0
+        self.generation = 0
+
+    # canonical nodes
+
+    def join(self, a, b, c, d):
+        key = (a, b, c, d)
+        node = self.nodes.get(key)
+        if node is None:
+            node = Node(a.k + 1, a, b, c, d, a.n + b.n + c.n + d.n)
+            self.nodes[key] = node
+        return node
+
+    def empty(self, k):
+        while len(self.empties) <= k:
+            e = self.empties[-1]
+            self.empties.append(self.join(e, e, e, e))
+        return self.empties[k]
+
+    def centre(self, m):
+        """
+        Node one level up with m in its middle
+        """
+        z = self.empty(m.k - 1)
+        return self.join(self.join(z, z, z, m.a), self.join(z, z, m.b, z),
+                         self.join(z, m.c, z, z), self.join(m.d, z, z, z))
+
+    def is_padded(self, m):
+        """
+        All live cells lie in the middle half of m
+        """
+        return (m.a.n == m.a.d.d.n and m.b.n == m.b.c.c.n and
+                m.c.n == m.c.b.b.n and m.d.n == m.d.a.a.n)
+
+    # evolution
+
+    def life(self, a, b, c, d, e, f, g, h, i):
+        """
+        Next state of the cell e given its neighbours
+        """
+        outer = a.n + b.n + c.n + d.n + f.n + g.n + h.n + i.n
+        return self.on if outer == 3 or (e.n and outer == 2) else self.off
+
+    def life_4x4(self, m):
+        """
+        Next generation of the middle 2x2 of a 4x4 node
+        """
+        a, b, c, d = m.a, m.b, m.c, m.d
+        return self.join(
+            self.life(a.a, a.b, b.a, a.c, a.d, b.c, c.a, c.b, d.a),
+            self.life(a.b, b.a, b.b, a.d, b.c, b.d, c.b, d.a, d.b),
+            self.life(a.c, a.d, b.c, c.a, c.b, d.a, c.c, c.d, d.c),
+            self.life(a.d, b.c, b.d, c.b, d.a, d.b, c.d, d.c, d.d))
+
+    def successor(self, m, j):
+        """
+        The middle half of m (one level down), 2^j generations later;
+        j is capped at m.k - 2, the most a node can be advanced
+        """
+        if m.n == 0:
+            return m.a
+        j = min(j, m.k - 2)
+        key = (m, j)
+        result = self.successors.get(key)
+        if result is not None:
+            return result
+        if m.k == 2:
+            result = self.life_4x4(m)
+        else:
+            a, b, c, d = m.a, m.b, m.c, m.d
+            join, step = self.join, self.successor
+            # at full speed the 2^j generations are two steps of 2^(j-1),
+            # the most the half size squares can be advanced
+            half = j if j < m.k - 2 else j - 1
+            # nine overlapping sub squares of half the size
+            c1 = step(a, half)
+            c2 = step(join(a.b, b.a, a.d, b.c), half)
+            c3 = step(b, half)
+            c4 = step(join(a.c, a.d, c.a, c.b), half)
+            c5 = step(join(a.d, b.c, c.b, d.a), half)
+            c6 = step(join(b.c, b.d, d.a, d.b), half)
+            c7 = step(c, half)
+            c8 = step(join(c.b, d.a, c.d, d.c), half)
+            c9 = step(d, half)
+            if j < m.k - 2:
+                # the nine squares are already 2^j generations on
+                result = join(join(c1.d, c2.c, c4.b, c5.a),
+                              join(c2.d, c3.c, c5.b, c6.a),
+                              join(c4.d, c5.c, c7.b, c8.a),
+                              join(c5.d, c6.c, c8.b, c9.a))
+            else:
+                # each half of the way
+                result = join(step(join(c1, c2, c4, c5), half),
+                              step(join(c2, c3, c5, c6), half),
+                              step(join(c4, c5, c7, c8), half),
+                              step(join(c5, c6, c8, c9), half))
+        self.successors[key] = result
+        return result
+
+    def grow(self):
+        """
+        Centres the root in a node twice its size
+        """
+        half = 1 << (self.root.k - 1)
+        self.root = self.centre(self.root)
+        self.top -= half
+        self.left -= half
+
+    def jump(self, k):
+        """
+        Advances the universe by 2^k generations in one step
+        """
+        while self.root.k < 3 or not self.is_padded(self.root):
+            self.grow()
+        while self.root.k < k + 2:
+            self.grow()
+        self.grow()
+        quarter = 1 << (self.root.k - 2)
+        self.root = self.successor(self.root, k)
+        self.top += quarter
+        self.left += quarter
+        self.generation += 1 << k
+        if len(self.nodes) > self.max_nodes:
+            self.collect()
+
+    def advance(self, generations):
+        """
+        Advances the universe by any number of generations, as jumps
+        of the powers of two it is made of
+        """
+        k = 0
+        while generations:
+            if generations & 1:
+                self.jump(k)
+            generations >>= 1
+            k += 1
+
+    def collect(self):
+        """
+        Garbage collection: keeps only the nodes of the current
+        universe (and the empty squares), forgetting the successors
+        """
+        keep = {}
+        stack = [self.root] + self.empties[1:]
+        while stack:
+            node = stack.pop()
+            if node.k == 0:
+                continue
+            key = (node.a, node.b, node.c, node.d)
+            if key in keep:
+                continue
+            keep[key] = node
+            stack.extend(key)
+        self.nodes = keep
+        self.successors = {}
+
+    # loading and reading out
+
+    def load_cells(self, cells):
+        """
+        Replaces the universe with the given live (row, column) cells
+        """
+        cells = list(cells)
+        self.generation = 0
+        if not cells:
+            self.root, self.top, self.left = self.empty(3), 0, 0
+            return
+        self.top = min(row for row, _ in cells)
+        self.left = min(col for _, col in cells)
+        level = {(row - self.top, col - self.left): self.on
+                 for row, col in cells}
+        k = 0
+        while len(level) > 1 or k < 3:
+            z = self.empty(k)
+            quads = {}
+            for (row, col), node in level.items():
+                quads.setdefault((row >> 1, col >> 1), {})[row & 1,
+                                                          col & 1] = node
+            level = {
+                parent: self.join(q.get((0, 0), z), q.get((0, 1), z),
+                                  q.get((1, 0), z), q.get((1, 1), z))
+                for parent, q in quads.items()
+            }
+            k += 1
+        self.root = level.popitem()[1]
+
+    def load_grid(self, grid):
+        """
+        Replaces the universe with the ON cells of a grid
+        """
+        self.load_cells(zip(*np.nonzero(grid == ON)))
+
+    def load_file(self, filename, i=0, j=0):
+        """
+        Replaces the universe with a coordinate file as read by
+        game.fill_from_file (a "row,column" per line), relative to the
+        resources directory unless the path exists, shifted by (i, j)
+        """
+        if not os.path.exists(filename):
+            filename = os.path.join(os.path.dirname(__file__), 'resources',
+                                    filename)
+        cells = []
+        with open(filename) as f:
+            for line in f:
+                if line.strip():
+                    row, col = line.split(',')
+                    cells.append((int(row) + i, int(col) + j))
+        self.load_cells(cells)
+
+    @property
+    def population(self):
+        return self.root.n
+
+    def cells(self):
+        """
+        Live (row, column) cells of the universe
+        """
+        found = []
+        stack = [(self.root, self.top, self.left)]
+        while stack:
+            node, row, col = stack.pop()
+            if node.n == 0:
+                continue
+            if node.k == 0:
+                found.append((row, col))
+                continue
+            half = 1 << (node.k - 1)
+            stack.extend([(node.a, row, col), (node.b, row, col + half),
+                          (node.c, row + half, col),
+                          (node.d, row + half, col + half)])
+        return found
+
+    def to_grid(self, top, left, rows, cols, dtype=np.uint8):
+        """
+        ON/OFF window of the universe with its top left cell at
+        (top, left), e.g. for imshow or the pattern counting
+        """
+        grid = np.full((rows, cols), OFF, dtype=dtype)
+        for row, col in self.cells():
+            if top <= row < top + rows and left <= col < left + cols:
+                grid[row - top, col - left] = ON
+        return grid
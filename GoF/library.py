@@ -0,0 +1,224 @@
+"""
+Pattern library: base patterns read once from coordinate or RLE files,
+expanded to every orientation and phase and compiled into the padded
+templates of census.PatternTable.
+
+A coordinate file holds one `row,column` pair of a live cell per line
+(the format of resources/patterns); an .rle file is the usual run
+length encoding of the Life community. The name of a pattern is its
+file name without the extension and a trailing `_<number>`, so
+glider_1.txt and glider_2.txt are both gliders.
+
+Every base pattern is run on an open plane to collect its phases (the
+whole cycle of an oscillator or spaceship), each phase is turned into
+its 8 rotations and reflections, and the variants are deduplicated by
+their canonical key. The compiled table is cached on disk under the
+content of the files, so catalogues load without being recompiled.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from stepping import ON, OFF, life_rule, neighbour_count
+
+CACHE_DIR = os.environ.get(
+    'GOF_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+# longest cycle looked for, covers the common oscillators (pulsar 3,
+# pentadecathlon 15) and spaceships
+MAX_PERIOD = 30
+# bumped whenever the compiled format or the expansion changes
+VERSION = 1
+
+
+def crop(cells):
+    """
+    Cells cut down to the bounding box of the live ones
+    """
+    rows = np.nonzero(cells.any(axis=1))[0]
+    cols = np.nonzero(cells.any(axis=0))[0]
+    if len(rows) == 0:
+        return np.zeros((0, 0), dtype=bool)
+    return cells[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def read_coordinates(text):
+    values = np.array(re.findall(r'(-?\d+)\s*,\s*(-?\d+)', text), dtype=int)
+    values = values.reshape(-1, 2)
+    values -= values.min(axis=0)
+    cells = np.zeros(values.max(axis=0) + 1, dtype=bool)
+    cells[values[:, 0], values[:, 1]] = True
+    return cells
+
+
+def read_rle(text):
+    lines = [line for line in text.splitlines()
+             if not line.startswith('#') and not line.lstrip().startswith('x')]
+    body = ''.join(lines).split('!')[0]
+    rows, row = [], []
+    for run, tag in re.findall(r'(\d*)([a-zA-Z$])', body):
+        run = int(run) if run else 1
+        if tag == '$':
+            rows.append(row)
+            rows.extend([[]] * (run - 1))
+            row = []
+        else:
+            row.extend([tag != 'b'] * run)
+    rows.append(row)
+    cells = np.zeros((len(rows), max(len(r) for r in rows)), dtype=bool)
+    for i, r in enumerate(rows):
+        cells[i, :len(r)] = r
+    return crop(cells)
+
+
+def read_cells(path):
+    """
+    Live cells of a pattern file, cropped to their bounding box
+    """
+    with open(path) as f:
+        text = f.read()
+    if path.endswith('.rle'):
+        return read_rle(text)
+    return read_coordinates(text)
+
+
+def pattern_name(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'_\d+$', '', stem)
+
+
+def pattern_files(paths):
+    """
+    Pattern files of the given files and directories, in order
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, filename)
+                for filename in sorted(os.listdir(path))
+                if filename.endswith(('.txt', '.rle')))
+        else:
+            files.append(path)
+    return files
+
+
+def symmetries(cells):
+    """
+    The 8 rotations and reflections of a pattern (some may coincide)
+    """
+    variants = [np.rot90(cells, k) for k in range(4)]
+    return variants + [variant.T for variant in variants]
+
+
+def phases(cells, max_period=MAX_PERIOD):
+    """
+    Phases of a pattern, simulated on a plane wide enough that the
+    wrap of the stepping functions never comes into play
+    :returns
+        cropped phases, the pattern itself first; just the pattern
+        when it does not come back within max_period generations
+    """
+    margin = max_period + 2
+    alive = np.pad(cells, margin).astype(np.uint8)
+    found = [cells]
+    for _ in range(max_period):
+        alive = life_rule(alive, neighbour_count(alive)).astype(np.uint8)
+        phase = crop(alive.astype(bool))
+        if phase.shape == cells.shape and (phase == cells).all():
+            return found
+        found.append(phase)
+    return [cells]
+
+
+def canonical_key(cells):
+    """
+    Hashable key of a cropped pattern, equal for equal patterns
+    """
+    return cells.shape, np.packbits(cells).tobytes()
+
+
+def template(cells):
+    """
+    Padded ON/OFF template of census.PatternTable
+    """
+    return np.where(np.pad(cells, 1), ON, OFF)
+
+
+def compile_patterns(files, max_period=MAX_PERIOD):
+    """
+    Every distinct orientation and phase of the patterns of the files
+    :returns
+        list of (name, cropped cells) pairs
+    """
+    seen = {}
+    compiled = []
+    for path in files:
+        name = pattern_name(path)
+        for phase in phases(read_cells(path), max_period):
+            for variant in symmetries(phase):
+                key = canonical_key(variant)
+                if key in seen:
+                    if seen[key] != name:
+                        raise ValueError(f"{path}: same shape as "
+                                         f"{seen[key]}")
+                    continue
+                seen[key] = name
+                compiled.append((name, np.ascontiguousarray(variant)))
+    return compiled
+
+
+def cache_path(files, max_period, cache_dir=None):
+    """
+    Content address of the compiled table of the files, None when
+    caching is off
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return None
+    digest = hashlib.sha256(f'{VERSION}:{max_period}'.encode())
+    for path in files:
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest.update(f'{os.path.basename(path)}:{len(content)}:'.encode())
+        digest.update(content)
+    return os.path.join(cache_dir, f'library-{digest.hexdigest()}.npz')
+
+
+def load_library(paths, max_period=MAX_PERIOD, cache_dir=None):
+    """
+    Templates of all the orientations and phases of the patterns in
+    the given files and directories, ready for census.PatternTable
+    :returns
+        list of (name, template) pairs
+    """
+    files = pattern_files(paths)
+    path = cache_path(files, max_period, cache_dir)
+    try:
+        with np.load(path) as entry:
+            shapes = entry['shapes']
+            ends = np.cumsum(shapes.prod(axis=1))
+            cells = np.split(entry['cells'].astype(bool), ends[:-1])
+            return [(str(name), template(c.reshape(shape)))
+                    for name, c, shape in zip(entry['names'], cells, shapes)]
+    except (OSError, TypeError, KeyError, ValueError):
+        pass
+
+    compiled = compile_patterns(files, max_period)
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written aside and renamed so that a parallel run never reads
+        # a half written table
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                            suffix='.tmp')
+        with os.fdopen(handle, 'wb') as f:
+            np.savez(f,
+                     names=np.array([name for name, _ in compiled]),
+                     shapes=np.array([c.shape for _, c in compiled]),
+                     cells=np.concatenate([c.ravel() for _, c in compiled
+                                           ]).astype(np.uint8))
+        os.replace(tmp_path, path)
+    return [(name, template(cells)) for name, cells in compiled]
@@ -0,0 +1,154 @@
+"""
+Bit-packed Game of Life board: 64 cells per uint64 word, stepped with
+bitwise adders instead of per-cell arithmetic.
+
+Bit b of word j in a row is the cell in column 64 * j + b; the unused
+high bits of the last word of each row are kept at zero. The board is
+toroidal like the grids of game.py and pattern.py.
+"""
+import numpy as np
+
+from stepping import ON, OFF
+
+WORD = np.dtype('<u8')
+ONE = np.uint64(1)
+
+
+class PackedBoard:
+    def __init__(self, words, cols):
+        """
+        :param words
+            (rows, ceil(cols / 64)) array of uint64 words
+        :param cols
+            number of cells in a row
+        """
+        self.words = words
+        self.cols = cols
+        self.last_bit = np.uint64((cols - 1) % 64)
+        # bits of the last word that hold cells
+        self.last_mask = np.uint64(2**((cols - 1) % 64 + 1) - 1)
+
+    @property
+    def shape(self):
+        return self.words.shape[0], self.cols
+
+    @classmethod
+    def zeros(cls, rows, cols):
+        return cls(np.zeros((rows, -(-cols // 64)), dtype=WORD), cols)
+
+    @classmethod
+    def from_grid(cls, grid):
+        """
+        Packs a grid of ON/OFF values (any dtype)
+        """
+        rows, cols = grid.shape
+        board = cls.zeros(rows, cols)
+        board.set_rows(0, grid)
+        return board
+
+    @classmethod
+    def random(cls, rows, cols, p=0.2, seed=None, chunk_rows=1024):
+        """
+        Random board with a share p of live cells, drawn a chunk of
+        rows at a time so that no unpacked copy of the whole board is
+        ever held
+        """
+        rng = np.random.default_rng(seed)
+        board = cls.zeros(rows, cols)
+        for start in range(0, rows, chunk_rows):
+            chunk = rng.random((min(chunk_rows, rows - start), cols)) < p
+            board.set_rows(start, chunk, alive=True)
+        return board
+
+    def set_rows(self, start, grid, alive=False):
+        """
+        Packs the rows of grid into the board from row start on
+        :param alive
+            grid already holds booleans instead of ON/OFF values
+        """
+        cells = grid if alive else grid == ON
+        padded = np.zeros((cells.shape[0], self.words.shape[1] * 64),
+                          dtype=bool)
+        padded[:, :self.cols] = cells
+        packed = np.packbits(padded, axis=1, bitorder='little')
+        self.words[start:start + cells.shape[0]] = packed.view(WORD)
+
+    def to_grid(self, dtype=np.uint8):
+        """
+        Unpacks the board to ON/OFF values, e.g. for imshow or for
+        the pattern counting
+        """
+        cells = np.unpackbits(self.words.view(np.uint8),
+                              axis=1,
+                              bitorder='little')[:, :self.cols]
+        return np.where(cells, ON, OFF).astype(dtype)
+
+    def population(self):
+        """
+        Number of live cells
+        """
+        return int(np.bitwise_count(self.words).sum())
+
+    def west(self, words):
+        """
+        Every cell gets the value of its left neighbour (with wrap)
+        """
+        shifted = words << ONE
+        shifted[:, 1:] |= words[:, :-1] >> np.uint64(63)
+        shifted[:, 0] |= (words[:, -1] >> self.last_bit) & ONE
+        shifted[:, -1] &= self.last_mask
+        return shifted
+
+    def east(self, words):
+        """
+        Every cell gets the value of its right neighbour (with wrap)
+        """
+        shifted = words >> ONE
+        shifted[:, :-1] |= words[:, 1:] << np.uint64(63)
+        shifted[:, -1] |= (words[:, 0] & ONE) << self.last_bit
+        return shifted
+
+    def step_rows(self, above, middle, below):
+        """
+        Next generation of the middle rows given the rows above and
+        below them. Each row of three is added into a two bit number
+        (the middle row without its own cell), the three numbers are
+        then summed: a cell lives if the twos add up to exactly one
+        and either the ones bit is set (3 neighbours) or it is already
+        alive (2 neighbours).
+        """
+        def row_sum(words, centre=True):
+            left, right = self.west(words), self.east(words)
+            if not centre:
+                return left ^ right, left & right
+            partial = left ^ words
+            return partial ^ right, (left & words) | (right & partial)
+
+        ones_a, twos_a = row_sum(above)
+        ones_m, twos_m = row_sum(middle, centre=False)
+        ones_b, twos_b = row_sum(below)
+        ones = ones_a ^ ones_m ^ ones_b
+        carry = (ones_a & ones_m) | (ones_b & (ones_a ^ ones_m))
+        # exactly one of the four twos: odd parity and not two of them
+        parity = twos_a ^ twos_m ^ twos_b ^ carry
+        at_least_two = (twos_a & twos_m) | (twos_b & carry) | \
+            ((twos_a ^ twos_m) & (twos_b ^ carry))
+        return parity & ~at_least_two & (ones | middle)
+
+    def step(self, out=None, block_rows=1024):
+        """
+        Next generation, computed a block of rows at a time so the
+        temporaries stay small on very large boards
+        :param out
+            board of the same shape whose buffer is reused
+        """
+        rows = self.words.shape[0]
+        if out is None:
+            out = PackedBoard(np.empty_like(self.words), self.cols)
+        for start in range(0, rows, block_rows):
+            stop = min(start + block_rows, rows)
+            middle = self.words[start:stop]
+            above = self.words[np.arange(start - 1, stop - 1) % rows]
+            below = self.words[np.arange(start + 1, stop + 1) % rows]
+            out.words[start:stop] = self.step_rows(above, middle, below)
+        return out
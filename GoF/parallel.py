@@ -0,0 +1,171 @@
+"""
+Multi-core Game of Life stepping over horizontal bands.
+
+The board lives in two shared memory buffers (current and next
+generation). Every worker of a persistent pool steps its band of rows
+from the current buffer into the next one, reading a single halo row
+above and below the band (wrapped, so the board stays toroidal); then
+the buffers swap roles. Only the band bounds travel between processes.
+"""
+import atexit
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from stepping import ON, life_rule, as_grid
+
+# views of the shared buffers of every stepper, by the name of its first
+# segment: set by attach in worker processes, by the stepper itself for
+# a thread pool, where several steppers share this process
+_buffers = {}
+_segments = {}
+
+
+def attach(names, shape):
+    """
+    Pool initializer, maps the shared buffers into the worker
+    """
+    _segments[names[0]] = [shared_memory.SharedMemory(name=name)
+                           for name in names]
+    _buffers[names[0]] = [np.ndarray(shape, dtype=np.uint8,
+                                     buffer=segment.buf)
+                          for segment in _segments[names[0]]]
+
+
+def step_band(start, stop, source, key):
+    """
+    Steps rows start..stop-1 of buffer source into the other buffer, of
+    the buffers attached under key
+    """
+    current, following = _buffers[key][source], _buffers[key][1 - source]
+    N = current.shape[0]
+    # the band with one halo row on each side
+    block = current.take(np.arange(start - 1, stop + 1) % N, axis=0)
+    rows = block + np.roll(block, 1, axis=1) + np.roll(block, -1, axis=1)
+    count = rows[:-2] + rows[1:-1] + rows[2:] - block[1:-1]
+    following[start:stop] = life_rule(block[1:-1], count)
+
+
+class ParallelStepper:
+    def __init__(self, processes=None, bands=None, threads=False):
+        """
+        :param processes
+            number of workers, all cores by default
+        :param bands
+            number of bands the board is split into, one per worker by
+            default
+        :param threads
+            use a thread pool instead of processes; numpy releases the
+            GIL in the band arithmetic, so threads also scale, with less
+            startup cost
+        """
+        self.processes = processes or os.cpu_count()
+        self.bands = bands or self.processes
+        self.threads = threads
+        self.pool = None
+        self.segments = []
+        self.shape = None
+        self.output = None
+
+    def start(self, shape):
+        """
+        Allocates the shared buffers for a board of the given shape
+        and starts the pool
+        """
+        self.close()
+        self.shape = shape
+        size = int(np.prod(shape))
+        self.segments = [shared_memory.SharedMemory(create=True, size=size)
+                         for _ in range(2)]
+        self.buffers = [np.ndarray(shape, dtype=np.uint8, buffer=s.buf)
+                        for s in self.segments]
+        self.source = 0
+        edges = np.linspace(0, shape[0], self.bands + 1).astype(int)
+        self.tasks = [(start, stop) for start, stop in zip(edges, edges[1:])
+                      if stop > start]
+        names = [s.name for s in self.segments]
+        self.key = names[0]
+        try:
+            if self.threads:
+                # threads see the buffers of this process directly
+                self.pool = ThreadPool(self.processes)
+                _buffers[self.key] = self.buffers
+            else:
+                self.pool = multiprocessing.Pool(self.processes,
+                                                 initializer=attach,
+                                                 initargs=(names, shape))
+        except BaseException:
+            # e.g. started from a daemonic pool worker, which cannot have
+            # children; the segments would be left behind otherwise
+            self.close()
+            raise
+
+    def load(self, grid):
+        """
+        Copies an ON/OFF grid into the current buffer
+        """
+        if self.pool is None or grid.shape != self.shape:
+            self.start(grid.shape)
+        np.equal(grid, ON, out=self.buffers[self.source], casting='unsafe')
+        self.output = None
+
+    @property
+    def alive(self):
+        """
+        Current generation as 0/1 cells (a view of the shared buffer)
+        """
+        return self.buffers[self.source]
+
+    def run(self, generations=1):
+        """
+        Advances the loaded board, without converting it back to a grid
+        """
+        for _ in range(generations):
+            self.pool.starmap(step_band,
+                              [(start, stop, self.source, self.key)
+                               for start, stop in self.tasks])
+            self.source = 1 - self.source
+
+    def __call__(self, grid):
+        """
+        Engine with the stepping.step contract. The board stays in shared
+        memory while the grid passed in is the previous output, as in the
+        update functions of game.py and pattern.py.
+        """
+        if self.output is None or grid.shape != self.output.shape or \
+                not np.array_equal(grid, self.output):
+            self.load(grid)
+        self.run()
+        self.output = as_grid(self.alive, grid)
+        return self.output
+
+    def close(self):
+        """
+        Stops the pool and frees the shared buffers
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.segments:
+            _buffers.pop(self.key, None)
+        self.buffers = []
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+        self.output = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# shared by stepping.step(grid, 'parallel'), stopped when Python exits
+default_stepper = ParallelStepper()
+atexit.register(default_stepper.close)
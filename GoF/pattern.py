@@ -3,87 +3,45 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import os
 import re
-import cv2
-from collections import Counter, defaultdict
+from collections import Counter
 import pandas as pd 
 import seaborn as sns 
 
+from census import PatternTable
+from library import load_library
+from sinks import CsvSink, MultiSink, RollingStats
+from stepping import step
+
 ON = 255
 OFF = 0
 vals = [ON, OFF]
 cumulative_statistics = Counter()
-running_statistics = defaultdict(list)
-
-horizontal_stencil = np.array([[0, 0, 0], [255, 255, 255], [0, 0, 0]])
-vertical_stencil = horizontal_stencil.T
-block = np.array([[255, 255], [255, 255]])
-tub = np.array([[0, 255, 0], [255, 0, 255], [0, 255, 0]])
-beehive1 = np.array([
-    [0, 255, 255, 0],
-    [255, 0, 0, 255],
-    [0, 255, 255, 0]
+
+# every orientation and phase of these patterns, see library.py
+patterns_list = load_library([
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources',
+                 'patterns', f'{name}.txt')
+    for name in ['blinker', 'beehive', 'tub', 'block', 'beacon', 'toad']
 ])
-beehive2 = beehive1.T
-beacon1 = np.array([[255, 255, 0, 0], [255, 0, 0, 0], [0, 0, 0, 255],
-                    [0, 0, 255, 255]])
-beacon2 = np.array([[255, 255, 0, 0], [255, 255, 0, 0], [0, 0, 255, 255],
-                    [0, 0, 255, 255]])
-toad1 = np.array([[0, 255, 255, 255], [255, 255, 255, 0]])
-toad2 = np.array([[0, 0, 255, 0], [255, 0, 0, 255], [255, 0, 0, 255],
-                  [0, 255, 0, 0]])
-
-
-patterns_list = [('blinker', horizontal_stencil), ('blinker', vertical_stencil),
-                    ('beehive', beehive1), ('beehive', beehive2),
-                    ('tub', tub), ('block', block), ('beacon', beacon1),
-                    ('beacon', beacon2), ('toad', toad1), ('toad', toad2)]
-patterns_list = [(name, np.pad(pat, 1)) for name, pat in patterns_list]
+
+pattern_table = PatternTable(patterns_list)
+
 
 def count_pattern_on_grid(grid, pattern):
-    M = cv2.matchTemplate(grid.astype('uint8'), pattern.astype('uint8'),
-                          cv2.TM_SQDIFF)
-    R, C = np.where(M == 0)
-    return R, C
+    return PatternTable([('', pattern)]).match(grid)[0]
 
 
-def update(frameNum, img, grid, N, patterns_grid):
+def update(frameNum, img, grid, N, patterns_grid, sink=None, engine='numpy'):
     # print('--- NEW ITERATION ---')
-    turn_statistics = Counter()
-    for pname, pattern in patterns_grid:
-        R, C = count_pattern_on_grid(grid, pattern)
-        if len(R) > 0 and (len(R) == len(C)):
-            cumulative_statistics[pname] += len(R)
-            turn_statistics[pname] += len(R)
-        else:
-            turn_statistics[pname] += 0    
+    # one census pass counts every pattern of the table (or only what
+    # changed, with an IncrementalCensus)
+    turn_statistics = patterns_grid.count(grid)
+    cumulative_statistics.update(+turn_statistics)
     # print(cumulative_statistics)
-    for turn_pattern in turn_statistics:
-        running_statistics[turn_pattern].append(turn_statistics[turn_pattern])
-    # copy grid since we require 8 neighbors
-    # for calculation and we go line by line
-    newGrid = grid.copy()
-    for i in range(N):
-        for j in range(N):
-            # compute 8-neghbor sum
-            # using toroidal boundary conditions - x and y wrap around
-            # so that the simulaton takes place on a toroidal surface.
-            total = int(
-                (grid[i,
-                      (j - 1) % N] + grid[i,
-                                          (j + 1) % N] + grid[(i - 1) % N, j] +
-                 grid[(i + 1) % N, j] + grid[(i - 1) % N,
-                                             (j - 1) % N] + grid[(i - 1) % N,
-                                                                 (j + 1) % N] +
-                 grid[(i + 1) % N, (j - 1) % N] + grid[(i + 1) % N,
-                                                       (j + 1) % N]) / 255)
-
-            # apply Conway's rules
-            if grid[i, j] == ON:
-                if (total < 2) or (total > 3):
-                    newGrid[i, j] = OFF
-            else:
-                if total == 3:
-                    newGrid[i, j] = ON
+    # the row of this generation streams to the sink (see sinks.py)
+    if sink is not None:
+        sink.append(turn_statistics)
+    newGrid = step(grid, engine)
 
     # update data
     if img is not None:
@@ -101,12 +59,18 @@ def run_game():
 
     update_interval = 50
     its = 50
+    # random boards change almost everywhere, an IncrementalCensus would
+    # re-match nearly every tile
+    census = pattern_table
+    filename = f'GOL-statistics-{its}_N_{N}_p_{p1}_acc.csv'
+    rolling = RollingStats(window=10)
+    sink = MultiSink([CsvSink(filename), rolling])
     animate = False 
     if animate:
         img = ax.imshow(grid, interpolation='nearest')
         ani = animation.FuncAnimation(fig,
                                     update,
-                                    fargs=(img, grid, N, patterns_list),
+                                    fargs=(img, grid, N, census, sink),
                                     frames=its,
                                     repeat=False,
                                     interval=update_interval)
@@ -116,13 +80,13 @@ def run_game():
         for random_inits in range(M):
             grid = np.random.choice(vals, N * N, p=[p1, 1.0-p1]).reshape(N, N)
             for i in range(its):
-                update(i, None, grid, N, patterns_list)
+                update(i, None, grid, N, census, sink)
         for pat in cumulative_statistics:
             print(pat, cumulative_statistics[pat]/M)
 
-    df = pd.DataFrame.from_dict(running_statistics)
-    df.to_csv(f'GOL-statistics-{its}_N_{N}_p_{p1}_acc.csv')
-    plot_statistics(f'GOL-statistics-{its}_N_{N}_p_{p1}_acc.csv')
+    sink.close()
+    print('last 10 generations:', rolling.rolling_mean())
+    plot_statistics(filename)
 
 
 def plot_statistics(filename, draw_barplot=False):
@@ -0,0 +1,222 @@
+"""
+Streaming sinks of per-generation statistics.
+
+A sink takes one row (a mapping of column to value, e.g. the census
+counts of a generation) at a time with append and keeps at most a
+bounded buffer of rows in memory; full buffers are written out, so a
+long run uses constant memory and a crash only loses the rows of the
+last unwritten buffer. All sinks have close and work as context
+managers.
+"""
+import csv
+import math
+import os
+from collections import deque
+
+
+class CsvSink:
+    def __init__(self, path, buffer_rows=256):
+        """
+        Rows appended to a csv file, with the generation number as the
+        first column, the layout of DataFrame.to_csv (read back with
+        pd.read_csv(path, index_col=0))
+        :param buffer_rows
+            rows kept before they are written
+        """
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.columns = None
+        self.rows = []
+        self.index = 0
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+
+    def append(self, row):
+        if self.columns is None:
+            # columns of the first row, later rows are written in order
+            self.columns = list(row)
+            self.writer.writerow([''] + self.columns)
+        self.rows.append([self.index] +
+                         [row.get(column, '') for column in self.columns])
+        self.index += 1
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        self.writer.writerows(self.rows)
+        self.rows = []
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetSink:
+    def __init__(self, path, buffer_rows=4096):
+        """
+        Rows written as a directory of Parquet files, one file per
+        buffer (read back with pd.read_parquet(path)); every written file
+        is complete, so the rows survive a crash (needs pyarrow)
+        """
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.columns = None
+        self.rows = []
+        self.index = 0
+        self.parts = 0
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, row):
+        if self.columns is None:
+            self.columns = list(row)
+        self.rows.append([self.index] + [row.get(c) for c in self.columns])
+        self.index += 1
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        names = ['generation'] + self.columns
+        columns = zip(*self.rows)
+        table = self.pa.Table.from_pydict(
+            {name: list(values)
+             for name, values in zip(names, columns)})
+        self.pq.write_table(
+            table, os.path.join(self.path, f'part-{self.parts:05d}.parquet'))
+        self.parts += 1
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RollingStats:
+    def __init__(self, window=10):
+        """
+        Online aggregates of every column: mean and standard deviation
+        over the last window rows (as pandas rolling with that window)
+        and over the whole run, from running sums instead of the rows
+        """
+        self.window = window
+        self.recent = {}
+        self.sums = {}
+        self.count = 0
+        # Welford accumulators of the whole run
+        self.means = {}
+        self.squares = {}
+
+    def append(self, row):
+        self.count += 1
+        for column, value in row.items():
+            value = float(value)
+            if column not in self.recent:
+                self.recent[column] = deque(maxlen=self.window)
+                self.sums[column] = [0.0, 0.0]
+                self.means[column] = 0.0
+                self.squares[column] = 0.0
+            recent, sums = self.recent[column], self.sums[column]
+            if len(recent) == self.window:
+                old = recent[0]
+                sums[0] -= old
+                sums[1] -= old * old
+            recent.append(value)
+            sums[0] += value
+            sums[1] += value * value
+
+            delta = value - self.means[column]
+            self.means[column] += delta / self.count
+            self.squares[column] += delta * (value - self.means[column])
+
+    def rolling_mean(self):
+        """
+        Mean of every column over the window, NaN until it is full
+        """
+        return {
+            column: sums[0] / self.window
+            if len(self.recent[column]) == self.window else math.nan
+            for column, sums in self.sums.items()
+        }
+
+    def rolling_std(self):
+        """
+        Sample standard deviation of every column over the window
+        """
+        stds = {}
+        for column, (total, squares) in self.sums.items():
+            if len(self.recent[column]) < max(self.window, 2):
+                stds[column] = math.nan
+                continue
+            variance = (squares - total * total / self.window) / (
+                self.window - 1)
+            stds[column] = math.sqrt(max(variance, 0.0))
+        return stds
+
+    def mean(self):
+        return dict(self.means)
+
+    def std(self):
+        return {
+            column: math.sqrt(squares / (self.count - 1))
+            if self.count > 1 else math.nan
+            for column, squares in self.squares.items()
+        }
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MultiSink:
+    def __init__(self, sinks):
+        """
+        Passes every row to all the sinks
+        """
+        self.sinks = list(sinks)
+
+    def append(self, row):
+        for sink in self.sinks:
+            sink.append(row)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_sink(path, **kwargs):
+    """
+    ParquetSink for a path ending in .parquet, CsvSink otherwise
+    """
+    if path.endswith('.parquet'):
+        return ParquetSink(path, **kwargs)
+    return CsvSink(path, **kwargs)
@@ -0,0 +1,155 @@
+"""
+Stepping engines of Conway's Game of Life on a toroidal grid.
+
+Every engine takes the current grid of ON/OFF cells and returns the
+next generation as a new array of the same shape and dtype; the x and
+y coordinates wrap around, as in the original per-cell update loop.
+"""
+import numpy as np
+
+ON = 255
+OFF = 0
+
+# (row, column) offsets of the 8 neighbours of a cell
+NEIGHBOUR_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1),
+                     (1, 0), (1, 1)]
+
+
+def neighbours(grid):
+    """
+    Yields, for each of the 8 neighbour offsets, the grid shifted so
+    that every cell holds the value of that neighbour (toroidal wrap).
+    The last two axes are the board, leading axes are left alone.
+    """
+    for di, dj in NEIGHBOUR_OFFSETS:
+        yield np.roll(grid, (-di, -dj), axis=(-2, -1))
+
+
+def neighbour_count(alive):
+    """
+    Number of live neighbours of every cell of a 0/1 uint8 array,
+    summed as rows of three and then columns of three
+    """
+    rows = alive + np.roll(alive, 1, axis=-1) + np.roll(alive, -1, axis=-1)
+    return rows + np.roll(rows, 1, axis=-2) + np.roll(rows, -1,
+                                                      axis=-2) - alive
+
+
+def life_rule(alive, count):
+    """
+    Conway's rules: a live cell survives with 2 or 3 neighbours,
+    a dead one comes alive with exactly 3
+    """
+    return (count == 3) | ((alive == 1) & (count == 2))
+
+
+def as_grid(alive, like):
+    """
+    0/1 cells back to ON/OFF values in the dtype of the original grid
+    """
+    return np.where(alive, ON, OFF).astype(like.dtype, copy=False)
+
+
+def step_loop(grid):
+    """
+    Reference engine, the original cell by cell update
+    """
+    N, M = grid.shape
+    newGrid = grid.copy()
+    for i in range(N):
+        for j in range(M):
+            # compute 8-neghbor sum
+            # using toroidal boundary conditions - x and y wrap around
+            # so that the simulaton takes place on a toroidal surface.
+            total = int((grid[i, (j - 1) % M] + grid[i, (j + 1) % M] +
+                         grid[(i - 1) % N, j] + grid[(i + 1) % N, j] +
+                         grid[(i - 1) % N, (j - 1) % M] +
+                         grid[(i - 1) % N, (j + 1) % M] +
+                         grid[(i + 1) % N, (j - 1) % M] +
+                         grid[(i + 1) % N, (j + 1) % M]) / 255)
+            # apply Conway's rules
+            if grid[i, j] == ON:
+                if (total < 2) or (total > 3):
+                    newGrid[i, j] = OFF
+            else:
+                if total == 3:
+                    newGrid[i, j] = ON
+    return newGrid
+
+
+def step_numpy(grid):
+    """
+    Vectorised engine, neighbour sums from shifted copies of the board
+    """
+    alive = (grid == ON).astype(np.uint8)
+    return as_grid(life_rule(alive, neighbour_count(alive)), grid)
+
+
+def step_scipy(grid):
+    """
+    Vectorised engine, neighbour sums as a wrapped convolution
+    (needs scipy)
+    """
+    from scipy import ndimage
+
+    alive = (grid == ON).astype(np.uint8)
+    kernel = np.ones((3, 3), dtype=np.uint8)
+    kernel[1, 1] = 0
+    count = ndimage.convolve(alive, kernel, mode='wrap')
+    return as_grid(life_rule(alive, count), grid)
+
+
+def step_packed(grid):
+    """
+    Bit-packed engine (see packed.PackedBoard), packing and unpacking
+    the grid around every generation
+    """
+    from packed import PackedBoard
+
+    return PackedBoard.from_grid(grid).step().to_grid(grid.dtype)
+
+
+def step_tiled(grid):
+    """
+    Dirty-tile engine (see tiled.TiledStepper), only recomputes the
+    tiles around the ones that changed in the previous generation. The
+    grid returned is the stepper's buffer, updated in place by the next
+    step.
+    """
+    from tiled import default_stepper
+
+    return default_stepper(grid)
+
+
+def step_parallel(grid):
+    """
+    Multi-core engine (see parallel.ParallelStepper), the board split
+    into bands over a process pool
+    """
+    from parallel import default_stepper
+
+    return default_stepper(grid)
+
+
+STEPPERS = {
+    'loop': step_loop,
+    'numpy': step_numpy,
+    'scipy': step_scipy,
+    'packed': step_packed,
+    'tiled': step_tiled,
+    'parallel': step_parallel,
+}
+
+
+def step(grid, engine='numpy'):
+    """
+    Next generation of the grid with the given engine, one of
+    STEPPERS or any callable with the same contract
+    """
+    if callable(engine):
+        return engine(grid)
+    try:
+        stepper = STEPPERS[engine]
+    except KeyError:
+        raise ValueError(f"Unknown engine: {engine}")
+    return stepper(grid)
@@ -0,0 +1,134 @@
+"""
+Dirty-tile stepping for mostly empty Game of Life boards.
+
+The board is cut into square tiles. A cell can only change if something
+in its 3x3 neighbourhood changed in the previous generation, so only
+the tiles next to a tile that changed are recomputed, and of those only
+the ones with live cells around them. The cost follows the activity on
+the board instead of its size.
+"""
+import numpy as np
+
+from stepping import ON, OFF, life_rule
+
+
+def dilate(tiles):
+    """
+    Tiles that are, or touch, a marked tile (toroidal)
+    """
+    grown = tiles.copy()
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            grown |= np.roll(tiles, (di, dj), axis=(0, 1))
+    return grown
+
+
+class TiledStepper:
+    def __init__(self, tile=32):
+        """
+        :param tile
+            side of the tiles in cells
+        """
+        self.tile = tile
+        self.alive = None
+        self.output = None
+        # the tracked board is at step generation of run number run (one
+        # run per reset), the tiles changed by that step (see census.py)
+        self.run = 0
+        self.generation = 0
+        self.changed = None
+
+    def reset(self, grid):
+        """
+        Starts tracking a new board, every tile near a live cell
+        is active
+        """
+        T = self.tile
+        N, M = grid.shape
+        self.alive = (grid == ON).astype(np.uint8)
+        tiles = (-(-N // T), -(-M // T))
+        padded = np.zeros((tiles[0] * T, tiles[1] * T), dtype=np.int64)
+        padded[:N, :M] = self.alive
+        # live cells of every tile
+        self.live = padded.reshape(tiles[0], T, tiles[1], T).sum(axis=(1, 3))
+        self.active = dilate(self.live > 0)
+        self.output = grid.copy()
+        self.run += 1
+        self.generation = 0
+        self.changed = None
+
+    def follows(self, grid):
+        """
+        Whether the grid is the current generation of the tracked board:
+        the array returned by the last step, or an equal copy of it (found
+        by comparing the whole grids)
+        """
+        if self.output is None:
+            return False
+        return grid is self.output or (grid.shape == self.output.shape and
+                                       np.array_equal(grid, self.output))
+
+    def tile_indices(self, ti, tj, halo=0):
+        """
+        Wrapped row and column indices of the given tiles, widened by
+        halo cells on each side. The last tiles of a board that is not a
+        multiple of the tile size run over into the first ones, their
+        extra cells are simply computed twice.
+        """
+        N, M = self.alive.shape
+        span = np.arange(-halo, self.tile + halo)
+        rows = (ti[:, None] * self.tile + span) % N
+        cols = (tj[:, None] * self.tile + span) % M
+        return rows, cols
+
+    def advance(self):
+        """
+        One generation of the tracked board, all active tiles at once
+        :returns
+            boolean array of the tiles that changed
+        """
+        changed = np.zeros_like(self.active)
+        ti, tj = np.nonzero(self.active)
+        if len(ti) == 0:
+            return changed
+        rows, cols = self.tile_indices(ti, tj, halo=1)
+        block = self.alive[rows[:, :, None], cols[:, None, :]]
+        count = (block[:, :-2, :-2] + block[:, :-2, 1:-1] +
+                 block[:, :-2, 2:] + block[:, 1:-1, :-2] +
+                 block[:, 1:-1, 2:] + block[:, 2:, :-2] +
+                 block[:, 2:, 1:-1] + block[:, 2:, 2:])
+        centre = block[:, 1:-1, 1:-1]
+        new = life_rule(centre, count).astype(np.uint8)
+
+        tile_changed = (new != centre).any(axis=(1, 2))
+        self.live[ti, tj] = new.sum(axis=(1, 2))
+        rows, cols = rows[tile_changed, 1:-1], cols[tile_changed, 1:-1]
+        self.alive[rows[:, :, None], cols[:, None, :]] = new[tile_changed]
+        changed[ti[tile_changed], tj[tile_changed]] = True
+        self.active = dilate(changed) & dilate(self.live > 0)
+        return changed
+
+    def __call__(self, grid):
+        """
+        Engine with the stepping.step contract, except that the array
+        returned is the stepper's own output buffer, of which the next
+        step rewrites only the tiles that changed. Passing it back (grid =
+        step(grid)) continues the tracked board without looking at the
+        rest of the grid, so it must not be modified in place; an equal
+        copy (as in the update functions) continues it too, any other
+        grid restarts it.
+        """
+        if not self.follows(grid):
+            self.reset(grid)
+        changed = self.advance()
+        self.generation += 1
+        self.changed = changed
+        ti, tj = np.nonzero(changed)
+        rows, cols = self.tile_indices(ti, tj)
+        cells = self.alive[rows[:, :, None], cols[:, None, :]]
+        self.output[rows[:, :, None], cols[:, None, :]] = np.where(
+            cells, ON, OFF)
+        return self.output
+
+# shared by stepping.step(grid, 'tiled')
+default_stepper = TiledStepper()
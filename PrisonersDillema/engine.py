@@ -0,0 +1,218 @@
+"""
+Vectorised iterated Prisoner's Dilemma: many independent matches
+played at once, one NumPy operation per step for all of them.
+
+The rules are those of game.py: moves are 1 (silent) and 0 (betray),
+the payoffs come from evaluate_players and every strategy of
+Player.make_move is a function of the opponent's last two moves (plus
+the revenge counter of 2tft, which is kept per player and survives
+strategy changes, as in Player). A mixed player picks a new strategy
+uniformly at every step, like Player.choose_strategy. Histories carry
+over between epochs while the step number starts again at 0.
+
+Deterministic strategies give exactly the moves and payoffs of
+run_simulation; 'random' and mixed players draw from a NumPy generator
+instead of the random module, so they agree in distribution only.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from game import STRATEGIES, evaluate_players
+
+# PAYOFFS[move_a, move_b] = (payoff a, payoff b)
+PAYOFFS = np.array([[evaluate_players(a, b) for b in (0, 1)]
+                    for a in (0, 1)])
+# moves of the opponent before the first steps of a match
+NO_MOVE = -1
+
+MatchResults = namedtuple(
+    'MatchResults',
+    ['mean_a', 'mean_b', 'std_a', 'std_b', 'payoffs_a', 'payoffs_b'])
+
+
+# Strategies as functions of the step number in the epoch and the last
+# two moves of the opponents (NO_MOVE before they exist), for all the
+# matches playing them at once; they get and return the revenge
+# counters of the players, for the ones that keep a state.
+
+
+def tft(step, last, penultimate, revenge, rng):
+    # replicate last
+    if step == 0:
+        return np.ones_like(last), revenge
+    return last.copy(), revenge
+
+
+def tft2(step, last, penultimate, revenge, rng):
+    # betray only after two betrayals
+    if step == 0:
+        return np.ones_like(last), revenge
+    both_betrayed = (last == 0) & (penultimate == 0)
+    return (~both_betrayed).astype(np.int8), revenge
+
+
+def two_tft(step, last, penultimate, revenge, rng):
+    # two betrayals are paid back twice
+    if step == 0:
+        return np.ones_like(last), revenge
+    both_betrayed = (last == 0) & (penultimate == 0)
+    # the second move of a match is always silent
+    seen_two = penultimate != NO_MOVE
+    start = seen_two & both_betrayed
+    hold = seen_two & ~both_betrayed & (revenge > 0)
+    revenge = np.where(start, 1, np.where(hold, revenge - 1, revenge))
+    return (~(start | hold)).astype(np.int8), revenge
+
+
+def random_moves(step, last, penultimate, revenge, rng):
+    return (rng.random(len(last)) > 0.5).astype(np.int8), revenge
+
+
+def always_defect(step, last, penultimate, revenge, rng):
+    # named after game.py, where it always stays silent
+    return np.ones_like(last), revenge
+
+
+def always_cooperate(step, last, penultimate, revenge, rng):
+    # named after game.py, where it always betrays
+    return np.zeros_like(last), revenge
+
+
+# registry of the strategies, the first ones in the order of
+# game.STRATEGIES, which mixed players draw from
+STRATEGY_MOVES = {
+    'tft': tft,
+    '2tft': two_tft,
+    'random': random_moves,
+    'always_defect': always_defect,
+    'always_cooperate': always_cooperate,
+    'tft2': tft2,
+}
+STRATEGY_MOVES = {name: STRATEGY_MOVES[name] for name in STRATEGIES}
+# strategies drawing from the generator, whose matches must be sampled
+STOCHASTIC = {'random'}
+
+
+def register_strategy(name, moves, stochastic=False):
+    """
+    Adds a strategy, a function with the signature of tft; with a
+    process pool, register it at import time so the workers know it
+    :param stochastic
+        the moves depend on the generator and not only on the history
+    """
+    STRATEGY_MOVES[name] = moves
+    if stochastic:
+        STOCHASTIC.add(name)
+
+
+def strategy_codes(strategy, matches):
+    """
+    Indices in STRATEGY_MOVES of the strategy of every match
+    :param strategy
+        a strategy name, or one name or index per match
+    """
+    names = list(STRATEGY_MOVES)
+    if isinstance(strategy, str):
+        return np.full(matches, names.index(strategy), dtype=np.int8)
+    codes = [names.index(s) if isinstance(s, str) else s for s in strategy]
+    return np.asarray(codes, dtype=np.int8)
+
+
+def moves(codes, step, last, penultimate, revenge, rng):
+    """
+    Moves of one side of all the matches, Player.make_move for arrays
+    :param codes
+        strategy of every match
+    :param step
+        step number in the epoch
+    :param last, penultimate
+        last two moves of the opponents, NO_MOVE before they exist
+    :param revenge
+        revenge counters of 2tft, updated in place
+    """
+    functions = list(STRATEGY_MOVES.values())
+    if (codes == codes[0]).all():
+        move, revenge[:] = functions[codes[0]](step, last, penultimate,
+                                               revenge, rng)
+        return move
+    # every strategy in play on all the matches, then the one of each
+    present = np.flatnonzero(np.bincount(codes, minlength=len(functions)))
+    results = [
+        functions[code](step, last, penultimate, revenge, rng)
+        for code in present
+    ]
+    choice = np.searchsorted(present, codes), np.arange(len(codes))
+    revenge[:] = np.stack([r for _, r in results])[choice]
+    return np.stack([m for m, _ in results])[choice]
+
+
+def play_matches(strategy_a,
+                 strategy_b,
+                 steps,
+                 epochs=1,
+                 matches=1000,
+                 mixed_a=False,
+                 mixed_b=False,
+                 seed=None,
+                 record=False,
+                 noise=0.0):
+    """
+    Plays independent matches between two players, all at once
+    :param strategy_a, strategy_b
+        strategy names (see strategy_codes); the starting strategies of
+        mixed players, which are redrawn before the first move anyway
+    :param steps
+        steps of every epoch
+    :param mixed_a, mixed_b
+        players changing strategy every step
+    :param record
+        keep the payoffs of every step
+    :param noise
+        probability that a move comes out flipped (trembling hand), the
+        flipped move is the one played and remembered
+    :returns
+        MatchResults, mean and std (as np.std) of the payoffs of each
+        match, and the (matches, steps * epochs) payoffs when recorded
+    """
+    rng = np.random.default_rng(seed)
+    codes_a = strategy_codes(strategy_a, matches)
+    codes_b = strategy_codes(strategy_b, matches)
+    # last two moves of each player and the revenge counters
+    last_a = np.full(matches, NO_MOVE, dtype=np.int8)
+    last_b = last_a.copy()
+    penultimate_a, penultimate_b = last_a.copy(), last_b.copy()
+    revenge_a = np.zeros(matches, dtype=np.int64)
+    revenge_b = revenge_a.copy()
+
+    sums = np.zeros((2, matches))
+    squares = np.zeros((2, matches))
+    recorded = np.zeros((2, matches, steps * epochs) if record else (2, 0, 0),
+                        dtype=np.int8)
+    for epoch in range(epochs):
+        for step in range(steps):
+            if mixed_a:
+                codes_a = rng.integers(len(STRATEGIES), size=matches)
+            if mixed_b:
+                codes_b = rng.integers(len(STRATEGIES), size=matches)
+            move_a = moves(codes_a, step, last_b, penultimate_b, revenge_a,
+                           rng)
+            move_b = moves(codes_b, step, last_a, penultimate_a, revenge_b,
+                           rng)
+            if noise:
+                move_a = move_a ^ (rng.random(matches) < noise)
+                move_b = move_b ^ (rng.random(matches) < noise)
+            payoffs = PAYOFFS[move_a, move_b].T
+            sums += payoffs
+            squares += payoffs.astype(np.float64)**2
+            if record:
+                recorded[:, :, epoch * steps + step] = payoffs
+            penultimate_a, last_a = last_a, move_a
+            penultimate_b, last_b = last_b, move_b
+
+    n = steps * epochs
+    means = sums / n
+    stds = np.sqrt(np.maximum(squares / n - means**2, 0.0))
+    return MatchResults(means[0], means[1], stds[0], stds[1],
+                        recorded[0] if record else None,
+                        recorded[1] if record else None)
@@ -0,0 +1,238 @@
+"""
+Evolution of strategy populations: replicator dynamics of strategy
+frequencies and a Moran process of a finite population of agents.
+
+The fitness of a strategy only depends on the expected payoffs of its
+matches against the others, so those are computed once per (pair of
+strategies, match length, noise) and kept in a PayoffCache; the
+populations then advance with array operations on the payoff matrix.
+The payoffs are exact where the strategies compile to Markov chains
+(markov.py, all of game.STRATEGIES and the mixed player, with or
+without noise); otherwise matches of deterministic strategies without
+noise are played once (they always go the same way) and the others are
+averaged over sampled matches.
+
+    python PrisonersDillema/evolution.py --dynamics moran --population 1000
+"""
+import argparse
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from engine import STOCHASTIC, STRATEGY_MOVES
+from markov import expected_payoffs
+from tournament import MIXED, play_pair
+
+
+class PayoffCache:
+    def __init__(self, samples=1000, seed=0, evaluators=None):
+        """
+        Expected payoffs per step of matches between strategies
+        :param evaluators
+            functions (strategy_a, strategy_b, steps, noise) returning the
+            expected payoffs of both sides, or None if they cannot tell,
+            tried before sampling; markov.expected_payoffs by default
+        :param samples
+            matches averaged for stochastic pairs or with noise
+        :param seed
+            root seed of the sampled matches, combined with the key of
+            every pair so each pair has a stream of its own
+        """
+        self.samples = samples
+        self.seed = seed
+        self.pairs = {}
+        self.matrices = {}
+        self.evaluators = ([expected_payoffs]
+                           if evaluators is None else list(evaluators))
+
+    def sampled(self, strategy_a, strategy_b, steps, noise):
+        """
+        Whether the matches of a pair are drawn from a generator
+        """
+        return bool(noise) or any(s in STOCHASTIC or s == MIXED
+                                  for s in (strategy_a, strategy_b))
+
+    def pair(self, strategy_a, strategy_b, steps, noise=0.0):
+        """
+        Expected payoff per step of both sides of a match
+        :returns
+            (payoff a, payoff b)
+        """
+        key = (strategy_a, strategy_b, steps, noise)
+        if key in self.pairs:
+            return self.pairs[key]
+        swapped = (strategy_b, strategy_a, steps, noise)
+        if swapped in self.pairs:
+            return self.pairs[swapped][::-1]
+
+        payoffs = None
+        for evaluate in self.evaluators:
+            payoffs = evaluate(strategy_a, strategy_b, steps, noise)
+            if payoffs is not None:
+                break
+        if payoffs is None:
+            sampled = self.sampled(strategy_a, strategy_b, steps, noise)
+            seed = [self.seed, zlib.crc32(repr(key).encode())]
+            row = play_pair(strategy_a, strategy_b, steps, 1,
+                            self.samples if sampled else 1, seed, noise)
+            payoffs = row['mean_a'], row['mean_b']
+        self.pairs[key] = tuple(float(p) for p in payoffs)
+        return self.pairs[key]
+
+    def matrix(self, strategies, steps, noise=0.0):
+        """
+        Payoff matrix of a set of strategies, A[i, j] the expected payoff
+        per step of strategy i against strategy j
+        """
+        key = (tuple(strategies), steps, noise)
+        if key not in self.matrices:
+            matrix = np.zeros((len(strategies), len(strategies)))
+            for i, a in enumerate(strategies):
+                for j, b in enumerate(strategies[i:], i):
+                    matrix[i, j], matrix[j, i] = self.pair(a, b, steps, noise)
+            self.matrices[key] = matrix
+        return self.matrices[key]
+
+
+default_cache = PayoffCache()
+
+
+def payoff_matrix(strategies, steps, noise=0.0, cache=None):
+    return (cache or default_cache).matrix(strategies, steps, noise)
+
+
+def fitness_shift(matrix):
+    """
+    Constant added to payoffs so every fitness is positive (the payoffs
+    of evaluate_players are years in prison, all zero or negative)
+    """
+    return 1.0 - np.min(matrix)
+
+
+def replicator(matrix, frequencies, generations, shift=None):
+    """
+    Discrete replicator dynamics, x_i <- x_i f_i / sum_j x_j f_j with
+    f = A x the expected payoff of every strategy in the population
+    :param frequencies
+        (S,) initial frequencies, or (R, S) for R populations at once
+    :param shift
+        added to the payoffs, fitness_shift by default
+    :returns
+        (generations + 1, ..., S) frequencies of every generation
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    fitness = matrix + (fitness_shift(matrix) if shift is None else shift)
+    x = np.array(frequencies, dtype=np.float64)
+    x /= x.sum(axis=-1, keepdims=True)
+    history = np.empty((generations + 1, ) + x.shape)
+    history[0] = x
+    for generation in range(1, generations + 1):
+        x = x * (x @ fitness.T)
+        x /= x.sum(axis=-1, keepdims=True)
+        history[generation] = x
+    return history
+
+
+def moran(matrix,
+          counts,
+          steps,
+          replicas=1,
+          seed=None,
+          shift=None,
+          mutation=0.0,
+          record_every=1):
+    """
+    Moran process of a population of fixed size, for many populations
+    at once: every step one agent, chosen in proportion to its fitness
+    (mean payoff against all the other agents), has an offspring that
+    replaces an agent chosen uniformly
+    :param counts
+        (S,) initial number of agents of each strategy, or (replicas, S)
+    :param mutation
+        probability that the offspring takes a uniformly drawn strategy
+    :param record_every
+        steps between recorded populations
+    :returns
+        (records, replicas, S) counts of every recorded step and the
+        step each population fixated at (-1 if it did not)
+    """
+    rng = np.random.default_rng(seed)
+    matrix = np.asarray(matrix, dtype=np.float64)
+    fitness = matrix + (fitness_shift(matrix) if shift is None else shift)
+    counts = np.broadcast_to(np.asarray(counts, dtype=np.int64),
+                             (replicas, matrix.shape[0])).copy()
+    population = counts[0].sum()
+    rows = np.arange(replicas)
+    fixated = np.full(replicas, -1)
+    history = [counts.copy()]
+    for step in range(1, steps + 1):
+        # mean payoff of each strategy against the rest of the population
+        payoffs = (counts @ fitness.T - np.diag(fitness)) / (population - 1)
+        weights = np.cumsum(counts * payoffs, axis=1)
+        birth = (weights <= rng.random((replicas, 1)) * weights[:, -1:]).sum(1)
+        if mutation:
+            mutants = rng.random(replicas) < mutation
+            birth[mutants] = rng.integers(matrix.shape[0], size=mutants.sum())
+        alive = np.cumsum(counts, axis=1)
+        death = (alive <= rng.integers(population, size=(replicas, 1))).sum(1)
+        counts[rows, birth] += 1
+        counts[rows, death] -= 1
+
+        done = (counts == population).any(axis=1)
+        fixated[done & (fixated < 0)] = step
+        if step % record_every == 0:
+            history.append(counts.copy())
+        if not mutation and done.all():
+            break
+    return np.stack(history), fixated
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evolves populations of Prisoner's Dilemma strategies.")
+    parser.add_argument('--strategies', nargs='+', default=None)
+    parser.add_argument('--dynamics',
+                        choices=['replicator', 'moran'],
+                        default='replicator')
+    parser.add_argument('--steps', type=int, default=100, help="match length")
+    parser.add_argument('--noise', type=float, default=0.0)
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--generations', type=int, default=100)
+    parser.add_argument('--population', type=int, default=1000)
+    parser.add_argument('--replicas', type=int, default=100)
+    parser.add_argument('--mutation', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='evolution.csv')
+    args = parser.parse_args()
+
+    strategies = args.strategies or list(STRATEGY_MOVES) + [MIXED]
+    cache = PayoffCache(args.samples, args.seed)
+    matrix = cache.matrix(strategies, args.steps, args.noise)
+    if args.dynamics == 'replicator':
+        frequencies = replicator(matrix,
+                                 np.ones(len(strategies)) / len(strategies),
+                                 args.generations)
+    else:
+        # a generation is as many steps as agents
+        counts = np.full(len(strategies), args.population // len(strategies))
+        counts[:args.population % len(strategies)] += 1
+        history, fixated = moran(matrix,
+                                 counts,
+                                 args.generations * args.population,
+                                 args.replicas,
+                                 args.seed,
+                                 mutation=args.mutation,
+                                 record_every=args.population)
+        frequencies = history.mean(axis=1) / args.population
+        winners = pd.Series(history[-1].argmax(axis=1)[fixated >= 0])
+        print(winners.map(dict(enumerate(strategies))).value_counts())
+    df = pd.DataFrame(frequencies, columns=strategies)
+    df.index.name = 'generation'
+    df.to_csv(args.output)
+    print(df.iloc[-1].to_string())
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
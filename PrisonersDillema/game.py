@@ -1,6 +1,5 @@
 import random
 import numpy as np
-import matplotlib.pyplot as plt
 """
 1 - silent
 0 - betray 
@@ -11,6 +10,10 @@ both silent -- both -1
 one betrays, one silent = 0/ -3
 """
 
+STRATEGIES = [
+    'tft', '2tft', 'random', 'always_defect', 'always_cooperate', 'tft2'
+]
+
 
 class Player:
     def __init__(self, strategy, mixed=False):
@@ -23,16 +26,12 @@ class Player:
         self.revenge_counter = 0
 
     def choose_strategy(self):
-        strategies = [
-            'tft', '2tft', 'random', 'always_defect', 'always_cooperate',
-            'tft2'
-        ]
         if self.mixed:
             if self.counter < 8 and self.counter != 0:
                 self.counter += 1
             else:
                 self.counter = 0
-                self.strategy = random.choice(strategies)
+                self.strategy = random.choice(STRATEGIES)
         else:
             return
 
@@ -133,6 +132,8 @@ def run_simulation(steps, epochs=1, plot=True):
     assert len(playerA.payoffs) == len(playerB.payoffs)
 
     if plot:
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots()
 
         ax.plot(np.cumsum(playerA.payoffs), '.', label='A payoff')
@@ -160,12 +161,25 @@ if __name__ == "__main__":
     t_pAmean, t_pBmean, t_pAstd, t_pBstd = 0, 0, 0, 0
     num_runs = 1
     plot = False if num_runs > 1 else True
-    for i in range(num_runs):
-        pAmean, pBmean, pAstd, pBstd = run_simulation(100, plot=plot)
-        t_pAmean += pAmean
-        t_pBmean += pBmean
-        t_pAstd += pAstd
-        t_pBstd += pBstd
+    if num_runs > 1:
+        # all the runs played at once as arrays, see engine.py
+        from engine import play_matches
+
+        results = play_matches('random',
+                               '2tft',
+                               100,
+                               matches=num_runs,
+                               mixed_a=True,
+                               mixed_b=True)
+        t_pAmean, t_pBmean = results.mean_a.sum(), results.mean_b.sum()
+        t_pAstd, t_pBstd = results.std_a.sum(), results.std_b.sum()
+    else:
+        for i in range(num_runs):
+            pAmean, pBmean, pAstd, pBstd = run_simulation(100, plot=plot)
+            t_pAmean += pAmean
+            t_pBmean += pBmean
+            t_pAstd += pAstd
+            t_pBstd += pBstd
 
     print(f"Player A: {t_pAmean/num_runs}, {t_pAstd/num_runs}")
     print(f"Player B: {t_pBmean/num_runs}, {t_pBstd/num_runs}")
@@ -0,0 +1,249 @@
+"""
+Exact expected payoffs of matches as Markov chains.
+
+Every strategy of engine.STRATEGY_MOVES decides from whether it is the
+first step of the epoch, the opponent's last two moves (NO_MOVE before
+they exist) and its revenge counter (0 or 1). So a strategy compiles
+into a table of the probabilities of (move, next revenge) in each of
+those states, found by calling its move function on all of them. A
+match is then a chain over (last two moves of both players, both
+revenge counters) and its payoffs over N steps follow from powers of
+the transition matrices instead of played matches:
+
+    >>> match_moments('tft', '2tft', 100)
+    MatchMoments(mean_a=-1.0, mean_b=-1.0, var_a=0.0, var_b=0.0)
+
+'random' moves silently with probability 0.5 and the mixed player
+averages the tables of game.STRATEGIES, with noise flipping the moves
+actually played. Strategies that cannot be compiled (other stochastic
+ones, or ones reading the step number beyond the first step) are
+played with engine.play_matches instead, see payoff_moments.
+"""
+import functools
+from collections import namedtuple
+
+import numpy as np
+
+from engine import NO_MOVE, PAYOFFS, STOCHASTIC, STRATEGY_MOVES, play_matches
+from game import STRATEGIES
+from tournament import MIXED
+
+# probability to stay silent of memoryless stochastic strategies
+STOCHASTIC_MOVES = {'random': 0.5}
+# values of a remembered move, index v + 1 in the tables
+MOVES = (NO_MOVE, 0, 1)
+
+MatchMoments = namedtuple('MatchMoments',
+                          ['mean_a', 'mean_b', 'var_a', 'var_b'])
+
+
+@functools.lru_cache(maxsize=None)
+def compile_strategy(name):
+    """
+    Table of a strategy, table[first, last + 1, penultimate + 1,
+    revenge, move, next revenge] the probability of the move and the
+    next revenge counter given whether it is the first step of the
+    epoch, the opponent's last two moves and the revenge counter
+    :returns
+        (2, 3, 3, 2, 2, 2) array, None if the strategy cannot be compiled
+    """
+    table = np.zeros((2, 3, 3, 2, 2, 2))
+    if name == MIXED:
+        tables = [compile_strategy(s) for s in STRATEGIES]
+        if any(t is None for t in tables):
+            return None
+        return np.mean(tables, axis=0)
+    if name in STOCHASTIC_MOVES:
+        silent = STOCHASTIC_MOVES[name]
+        for revenge in (0, 1):
+            table[:, :, :, revenge, 1, revenge] = silent
+            table[:, :, :, revenge, 0, revenge] = 1 - silent
+        return table
+    if name in STOCHASTIC or name not in STRATEGY_MOVES:
+        return None
+
+    # every (last, penultimate, revenge) state at once
+    last, penultimate, revenge = np.meshgrid(MOVES, MOVES, (0, 1),
+                                             indexing='ij')
+    last, penultimate = last.ravel(), penultimate.ravel()
+    revenge = revenge.ravel()
+    rng = np.random.default_rng(0)
+    outcomes = []
+    # steps after the first must all give the same moves (in the
+    # states they can be in)
+    for step in (0, 1, 2):
+        move, after = STRATEGY_MOVES[name](step, last.astype(np.int8),
+                                           penultimate.astype(np.int8),
+                                           revenge.astype(np.int64), rng)
+        outcomes.append((np.asarray(move), np.asarray(after)))
+    (move_1, after_1), (move_2, after_2) = outcomes[1:]
+    if not ((move_1 == move_2).all() and (after_1 == after_2).all()):
+        return None
+    # after the first step of a match there always is a last move
+    seen = last != NO_MOVE
+    for first, (move, after), states in [(1, outcomes[0], slice(None)),
+                                         (0, outcomes[2], seen)]:
+        move, after = move[states], after[states]
+        if not (np.isin(move, (0, 1)).all() and np.isin(after, (0, 1)).all()):
+            return None
+        table[first, last[states] + 1, penultimate[states] + 1,
+              revenge[states], move, after] = 1.0
+    return table
+
+
+@functools.lru_cache(maxsize=None)
+def match_chain(strategy_a, strategy_b, noise=0.0):
+    """
+    Markov chain of a match over the states (last_a, penultimate_a,
+    last_b, penultimate_b, revenge_a, revenge_b) reachable from the
+    start of a match
+    :returns
+        (first, later, start, rewards), the transition matrices of the
+        first step of an epoch and of the others, the start distribution
+        and the (2, states) payoffs of a and b on entering every state;
+        None if a strategy cannot be compiled
+    """
+    table_a = compile_strategy(strategy_a)
+    table_b = compile_strategy(strategy_b)
+    if table_a is None or table_b is None:
+        return None
+    if noise:
+        # the played move is flipped with probability noise
+        table_a = (1 - noise) * table_a + noise * table_a[..., ::-1, :]
+        table_b = (1 - noise) * table_b + noise * table_b[..., ::-1, :]
+
+    def successors(state, first):
+        last_a, penultimate_a, last_b, penultimate_b, revenge_a, revenge_b = \
+            state
+        # each player sees the history of the other one
+        a = table_a[first, last_b + 1, penultimate_b + 1, revenge_a]
+        b = table_b[first, last_a + 1, penultimate_a + 1, revenge_b]
+        for move_a, after_a, move_b, after_b in np.argwhere(
+                np.multiply.outer(a, b) > 0):
+            yield ((move_a, last_a, move_b, last_b, after_a, after_b),
+                   a[move_a, after_a] * b[move_b, after_b])
+
+    start = (NO_MOVE, NO_MOVE, NO_MOVE, NO_MOVE, 0, 0)
+    index = {start: 0}
+    transitions = []
+    queue = [start]
+    while queue:
+        state = queue.pop()
+        for first in (1, 0):
+            for after, probability in successors(state, first):
+                after = tuple(int(v) for v in after)
+                if after not in index:
+                    index[after] = len(index)
+                    queue.append(after)
+                transitions.append(
+                    (first, index[state], index[after], probability))
+
+    states = len(index)
+    matrices = np.zeros((2, states, states))
+    for first, i, j, probability in transitions:
+        matrices[first, i, j] += probability
+    rewards = np.zeros((2, states))
+    for (move_a, _, move_b, _, _, _), i in index.items():
+        if move_a != NO_MOVE:
+            rewards[:, i] = PAYOFFS[move_a, move_b]
+    start = np.zeros(states)
+    start[0] = 1.0
+    return matrices[1], matrices[0], start, rewards
+
+
+def moment_matrix(transitions, rewards):
+    """
+    Augmented matrix taking the row vector (P(s), E[S; s], E[S^2; s]) of
+    the chain and the payoff sum S over one step
+    """
+    weighted = transitions * rewards
+    zeros = np.zeros_like(transitions)
+    return np.block([[transitions, weighted, weighted * rewards],
+                     [zeros, transitions, 2 * weighted],
+                     [zeros, zeros, transitions]])
+
+
+def match_moments(strategy_a, strategy_b, steps, epochs=1, noise=0.0):
+    """
+    Exact mean and variance of the mean payoff per step of a match, as
+    the mean_a and mean_b of engine.play_matches over many matches
+    :returns
+        MatchMoments, None if a strategy cannot be compiled
+    """
+    chain = match_chain(strategy_a, strategy_b, noise)
+    if chain is None:
+        return None
+    first, later, start, rewards = chain
+    n = steps * epochs
+    moments = []
+    for reward in rewards:
+        epoch = moment_matrix(first, reward) @ np.linalg.matrix_power(
+            moment_matrix(later, reward), steps - 1)
+        vector = np.concatenate([start, np.zeros(2 * len(start))])
+        vector = vector @ np.linalg.matrix_power(epoch, epochs)
+        total, squares = vector.reshape(3, -1)[1:].sum(axis=1)
+        moments.append((float(total / n),
+                        float(max(squares - total * total, 0.0) / n**2)))
+    (mean_a, var_a), (mean_b, var_b) = moments
+    return MatchMoments(mean_a, mean_b, var_a, var_b)
+
+
+def long_run(strategy_a, strategy_b, noise=0.0, squarings=64):
+    """
+    Average payoff per step of both players over an endless match, from
+    the limit distribution of the chain (of its lazy version, which has
+    the same limit averages and converges when the chain is periodic)
+    :returns
+        (payoff a, payoff b), None if a strategy cannot be compiled
+    """
+    chain = match_chain(strategy_a, strategy_b, noise)
+    if chain is None:
+        return None
+    first, later, start, rewards = chain
+    limit = (later + np.eye(len(start))) / 2
+    for _ in range(squarings):
+        limit = limit @ limit
+        # rows drift off 1 with rounding, which 2^squarings steps blow up
+        limit /= limit.sum(axis=1, keepdims=True)
+    payoffs = start @ first @ limit @ rewards.T
+    return float(payoffs[0]), float(payoffs[1])
+
+
+def expected_payoffs(strategy_a, strategy_b, steps, noise=0.0):
+    """
+    Evaluator of evolution.PayoffCache, the exact expected payoffs per
+    step of a match, or None
+    """
+    moments = match_moments(strategy_a, strategy_b, steps, noise=noise)
+    if moments is None:
+        return None
+    return moments.mean_a, moments.mean_b
+
+
+def payoff_moments(strategy_a,
+                   strategy_b,
+                   steps,
+                   epochs=1,
+                   noise=0.0,
+                   samples=1000,
+                   seed=None):
+    """
+    match_moments when the strategies compile, otherwise the sample
+    mean and variance of played matches
+    """
+    moments = match_moments(strategy_a, strategy_b, steps, epochs, noise)
+    if moments is not None:
+        return moments
+    results = play_matches(strategy_a if strategy_a != MIXED else 'tft',
+                           strategy_b if strategy_b != MIXED else 'tft',
+                           steps,
+                           epochs,
+                           matches=samples,
+                           mixed_a=strategy_a == MIXED,
+                           mixed_b=strategy_b == MIXED,
+                           seed=seed,
+                           noise=noise)
+    return MatchMoments(float(results.mean_a.mean()),
+                        float(results.mean_b.mean()),
+                        float(results.mean_a.var(ddof=1)),
+                        float(results.mean_b.var(ddof=1)))
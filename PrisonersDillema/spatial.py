@@ -0,0 +1,126 @@
+"""
+Spatial Prisoner's Dilemma: every cell of a toroidal lattice holds a
+strategy, plays a match against each of its 8 neighbours every
+generation and then takes the strategy of the best scoring cell of its
+neighbourhood (itself included, it keeps its own on ties).
+
+    python PrisonersDillema/spatial.py --size 2000 --generations 100
+
+A match is worth the expected payoff per step of the two strategies
+(evolution.PayoffCache, for the given match length and noise), so a
+generation is a few array operations over the whole lattice, with the
+neighbours of GoF/stepping.py. The share of every strategy is streamed
+to a sink of GoF/sinks.py once per generation.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from evolution import payoff_matrix
+from tournament import entrants
+
+# the stepping and sinks modules of the Game of Life; appended so this
+# directory's game.py is still the one imported
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GoF'))
+from sinks import MultiSink, RollingStats, open_sink
+from stepping import neighbours
+
+
+def random_lattice(N, strategies, shares=None, seed=None):
+    """
+    N x N lattice of strategy indices drawn with the given shares
+    (uniform by default)
+    """
+    rng = np.random.default_rng(seed)
+    return rng.choice(len(strategies), size=(N, N),
+                      p=shares).astype(np.int8)
+
+
+def lattice_payoffs(lattice, matrix):
+    """
+    Payoff of every cell summed over its matches with the 8 neighbours
+    :param matrix
+        matrix[i, j] payoff of strategy i against strategy j
+    """
+    S = matrix.shape[0]
+    flat = np.asarray(matrix, dtype=np.float32).ravel()
+    own = lattice.astype(np.intp) * S
+    payoffs = np.zeros(lattice.shape, dtype=np.float32)
+    for neighbour in neighbours(lattice):
+        payoffs += flat[own + neighbour]
+    return payoffs
+
+
+def imitate(lattice, payoffs):
+    """
+    Strategy of the cell with the highest payoff in the neighbourhood
+    of every cell
+    """
+    best = payoffs.copy()
+    chosen = lattice.copy()
+    for payoff, strategy in zip(neighbours(payoffs), neighbours(lattice)):
+        better = payoff > best
+        np.copyto(best, payoff, where=better)
+        np.copyto(chosen, strategy, where=better)
+    return chosen
+
+
+def shares(lattice, strategies):
+    """
+    Fraction of the cells playing each strategy
+    """
+    counts = np.bincount(lattice.ravel(), minlength=len(strategies))
+    return dict(zip(strategies, (counts / lattice.size).tolist()))
+
+
+def run_spatial(lattice, matrix, strategies, generations, sink=None):
+    """
+    Plays and imitates for a number of generations
+    :param sink
+        gets a row per generation (before it is played) with the share
+        of every strategy and the mean payoff of a cell
+    :returns
+        lattice after the last generation
+    """
+    for _ in range(generations):
+        payoffs = lattice_payoffs(lattice, matrix)
+        if sink is not None:
+            row = shares(lattice, strategies)
+            row['mean_payoff'] = float(payoffs.mean(dtype=np.float64))
+            sink.append(row)
+        lattice = imitate(lattice, payoffs)
+    return lattice
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs the spatial Prisoner's Dilemma on a lattice.")
+    parser.add_argument('--size', type=int, default=2000)
+    parser.add_argument('--strategies', nargs='+', default=None)
+    parser.add_argument('--generations', type=int, default=100)
+    parser.add_argument('--steps', type=int, default=100, help="match length")
+    parser.add_argument('--noise', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output',
+                        default='spatial.csv',
+                        help="csv, or a .parquet directory")
+    args = parser.parse_args()
+
+    strategies = args.strategies or entrants()
+    matrix = payoff_matrix(strategies, args.steps, args.noise)
+    lattice = random_lattice(args.size, strategies, seed=args.seed)
+    rolling = RollingStats()
+    with MultiSink([open_sink(args.output), rolling]) as sink:
+        run_spatial(lattice, matrix, strategies, args.generations, sink)
+    # averages over the whole run, defined for any number of generations
+    print("Mean over the generations:")
+    for name, share in rolling.mean().items():
+        print(f"{name}: {share}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Round-robin tournament of iterated Prisoner's Dilemma strategies: every
+pair of entrants, self-play included, plays repeated matches (with the
+vectorised engine), spread over a process pool.
+
+    python PrisonersDillema/tournament.py --steps 100 --repetitions 500
+
+The entrants are the strategies of engine.STRATEGY_MOVES (those of
+game.STRATEGIES and any registered one) and 'mixed', the player that
+draws a new strategy every step. Each pair gets its own seed spawned
+from the root seed, so the results do not depend on the pool.
+"""
+import argparse
+import itertools
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from engine import STRATEGY_MOVES, play_matches
+
+# entrant redrawing its strategy every step (Player(..., mixed=True))
+MIXED = 'mixed'
+
+
+def entrants():
+    """
+    Every registered strategy and the mixed player
+    """
+    return list(STRATEGY_MOVES) + [MIXED]
+
+
+def play_pair(strategy_a,
+              strategy_b,
+              steps,
+              epochs,
+              repetitions,
+              seed,
+              noise=0.0):
+    """
+    Repeated matches of a pair of entrants
+    :param noise
+        probability of a flipped move, see engine.play_matches
+    :returns
+        row with the mean payoff per step of each side over the
+        repetitions, its standard deviation across repetitions and the
+        95% confidence interval of the mean
+    """
+    results = play_matches(strategy_a if strategy_a != MIXED else 'tft',
+                           strategy_b if strategy_b != MIXED else 'tft',
+                           steps,
+                           epochs,
+                           matches=repetitions,
+                           mixed_a=strategy_a == MIXED,
+                           mixed_b=strategy_b == MIXED,
+                           seed=seed,
+                           noise=noise)
+    row = {
+        'strategy_a': strategy_a,
+        'strategy_b': strategy_b,
+        'repetitions': repetitions
+    }
+    for side, means in [('a', results.mean_a), ('b', results.mean_b)]:
+        mean, std = means.mean(), means.std(ddof=1) if repetitions > 1 else 0.0
+        std_error = std / np.sqrt(repetitions)
+        row[f'mean_{side}'] = mean
+        row[f'std_{side}'] = std
+        row[f'ci_low_{side}'] = mean - 1.96 * std_error
+        row[f'ci_high_{side}'] = mean + 1.96 * std_error
+    return row
+
+
+def run_tournament(strategies=None,
+                   steps=100,
+                   epochs=1,
+                   repetitions=100,
+                   seed=0,
+                   processes=None,
+                   noise=0.0):
+    """
+    Plays every pair of entrants, self-play included, one pair per task
+    :param strategies
+        entrants, all of them by default (see entrants)
+    :param processes
+        number of worker processes, all cores by default
+    :returns
+        dataframe with a row per pair, see play_pair
+    """
+    strategies = strategies or entrants()
+    pairs = list(itertools.combinations_with_replacement(strategies, 2))
+    seeds = np.random.SeedSequence(seed).spawn(len(pairs))
+    tasks = [(a, b, steps, epochs, repetitions, pair_seed, noise)
+             for (a, b), pair_seed in zip(pairs, seeds)]
+    with multiprocessing.Pool(processes) as pool:
+        rows = pool.starmap(play_pair, tasks, chunksize=1)
+    return pd.DataFrame(rows)
+
+
+def payoff_matrix(pairs):
+    """
+    Mean payoff per step of the row entrant against the column one,
+    ranked by the average over all opponents (self-play averages both
+    sides)
+    :returns
+        (matrix, ranking) dataframe and series
+    """
+    strategies = list(
+        dict.fromkeys(list(pairs['strategy_a']) + list(pairs['strategy_b'])))
+    matrix = pd.DataFrame(np.nan, index=strategies, columns=strategies)
+    for row in pairs.itertuples():
+        if row.strategy_a == row.strategy_b:
+            matrix.loc[row.strategy_a,
+                       row.strategy_a] = (row.mean_a + row.mean_b) / 2
+        else:
+            matrix.loc[row.strategy_a, row.strategy_b] = row.mean_a
+            matrix.loc[row.strategy_b, row.strategy_a] = row.mean_b
+    ranking = matrix.mean(axis=1).sort_values(ascending=False)
+    ranking.name = 'mean_payoff'
+    return matrix.loc[ranking.index, ranking.index], ranking
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs a round-robin Prisoner's Dilemma tournament.")
+    parser.add_argument('--strategies', nargs='+', default=None)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--repetitions', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--noise',
+                        type=float,
+                        default=0.0,
+                        help="probability of a flipped move")
+    parser.add_argument('--output', default='tournament')
+    args = parser.parse_args()
+
+    pairs = run_tournament(args.strategies, args.steps, args.epochs,
+                           args.repetitions, args.seed, args.processes,
+                           args.noise)
+    matrix, ranking = payoff_matrix(pairs)
+    pairs.to_csv(f'{args.output}_pairs.csv', index=False)
+    matrix.to_csv(f'{args.output}_matrix.csv')
+    print(ranking.to_string())
+    print(f"Results written to {args.output}_pairs.csv and " +
+          f"{args.output}_matrix.csv")
+
+
+if __name__ == '__main__':
+    main()